@@ -0,0 +1,172 @@
+import os
+import sys
+
+import numpy as np
+
+from face_collection import load_collection, resolve_collection_path
+
+ANN_SUFFIX = ".ann.npz"
+ANN_VERSION = 1
+DEFAULT_RECALL = 0.95
+_BLOCK_ROWS = 65536
+
+def ann_path(collection_path):
+    return collection_path + ANN_SUFFIX
+
+def _squared_distances(points, centroids):
+    """Squared euclidean distances between every point and every centroid."""
+    points = np.asarray(points, dtype=np.float32)
+    distances = (points * points).sum(axis=1)[:, None] - 2.0 * points @ centroids.T
+    distances += (centroids * centroids).sum(axis=1)[None, :]
+    return distances
+
+def _nearest_centroid(encodings, centroids):
+    labels = np.empty(len(encodings), dtype=np.int32)
+    for start in range(0, len(encodings), _BLOCK_ROWS):
+        block = encodings[start:start + _BLOCK_ROWS]
+        labels[start:start + len(block)] = _squared_distances(block, centroids).argmin(axis=1)
+    return labels
+
+def _kmeans(points, n_lists, iterations, rng):
+    centroids = points[rng.choice(len(points), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _squared_distances(points, centroids).argmin(axis=1)
+        counts = np.bincount(labels, minlength=n_lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty lists on random points so every list stays useful
+        if not filled.all():
+            centroids[~filled] = points[rng.choice(len(points), int((~filled).sum()), replace=False)]
+    return centroids
+
+class AnnIndex:
+    """Inverted-file index over k-means centroids.
+
+    Rows of the collection are grouped by their nearest centroid. A query
+    probes the n_probe closest lists and re-ranks their rows with exact
+    distances, so anything it returns has its true distance; n_probe only
+    trades recall for speed. recall_curve[n - 1] is the recall measured at
+    build time when probing n lists, for neighbours within the tolerance
+    used for calibration.
+    """
+
+    def __init__(self, centroids, order, offsets, recall_curve, count, signature=None):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.recall_curve = recall_curve
+        self.count = count
+        self.signature = signature
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def n_probe_for_recall(self, recall):
+        """Smallest number of probed lists that reached the requested recall at build time."""
+        reached = np.flatnonzero(self.recall_curve >= recall)
+        return int(reached[0]) + 1 if len(reached) else self.n_lists
+
+    def candidates(self, query, n_probe):
+        query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        n_probe = max(1, min(n_probe, self.n_lists))
+        distances = _squared_distances(query, self.centroids)[0]
+        lists = np.argpartition(distances, n_probe - 1)[:n_probe]
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+    def search(self, encodings, query, tolerance=0.6, n_probe=None, recall=DEFAULT_RECALL):
+        """Return (rows, distances) of the candidates within tolerance, in row order."""
+        if n_probe is None:
+            n_probe = self.n_probe_for_recall(recall)
+        rows = np.sort(self.candidates(query, n_probe))
+        distances = np.linalg.norm(np.asarray(encodings[rows], dtype=np.float32) - np.asarray(query, dtype=np.float32), axis=1)
+        within = distances <= tolerance
+        return rows[within], distances[within]
+
+def _recall_curve(encodings, labels, centroids, tolerance, samples, rng):
+    """Fraction of true neighbours found when probing 1..n_lists lists, measured on sample queries."""
+    n_lists = len(centroids)
+    query_rows = np.sort(rng.choice(len(encodings), min(samples, len(encodings)), replace=False))
+    queries = np.asarray(encodings[query_rows], dtype=np.float32)
+    # Rank of every list for every query, closest list first
+    list_rank = np.empty((len(queries), n_lists), dtype=np.int64)
+    np.put_along_axis(list_rank, np.argsort(_squared_distances(queries, centroids), axis=1),
+                      np.arange(n_lists)[None, :], axis=1)
+
+    found_at = np.zeros(n_lists, dtype=np.int64)
+    for start in range(0, len(encodings), _BLOCK_ROWS):
+        block = np.asarray(encodings[start:start + _BLOCK_ROWS], dtype=np.float32)
+        within = _squared_distances(queries, block) <= tolerance * tolerance
+        # The queries themselves are always found
+        own = (query_rows >= start) & (query_rows < start + len(block))
+        within[np.flatnonzero(own), query_rows[own] - start] = False
+        query_idx, block_idx = np.nonzero(within)
+        found_at += np.bincount(list_rank[query_idx, labels[start + block_idx]], minlength=n_lists)
+    if not found_at.sum():
+        return np.ones(n_lists)
+    return np.cumsum(found_at) / found_at.sum()
+
+def build_ann_index(encodings, n_lists=None, iterations=8, tolerance=0.6, calibration_samples=200, seed=0):
+    """Build an AnnIndex for an (N, 128) encodings matrix."""
+    rng = np.random.default_rng(seed)
+    count = len(encodings)
+    if count == 0:
+        raise ValueError("Cannot build an ANN index for an empty collection")
+    if n_lists is None:
+        n_lists = int(4 * np.sqrt(count))
+    n_lists = max(1, min(n_lists, count))
+
+    # Train on a sample; k-means does not need every row to place the centroids
+    sample = np.sort(rng.choice(count, min(count, 32 * n_lists, 100000), replace=False))
+    centroids = _kmeans(np.asarray(encodings[sample], dtype=np.float32), n_lists, iterations, rng)
+
+    labels = _nearest_centroid(encodings, centroids)
+    order = np.argsort(labels, kind="stable").astype(np.int32)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))]).astype(np.int64)
+    recall_curve = _recall_curve(encodings, labels, centroids, tolerance, calibration_samples, rng)
+    return AnnIndex(centroids, order, offsets, recall_curve, count)
+
+def _collection_signature(collection_path):
+    stat = os.stat(collection_path)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+def save_ann_index(collection_path, index):
+    """Persist an index next to its collection, tied to the current collection file."""
+    collection_path = resolve_collection_path(collection_path)
+    tmp_path = ann_path(collection_path) + ".tmp.npz"
+    np.savez(tmp_path, version=ANN_VERSION, centroids=index.centroids, order=index.order, offsets=index.offsets,
+             recall_curve=index.recall_curve, count=index.count, signature=_collection_signature(collection_path))
+    os.replace(tmp_path, ann_path(collection_path))
+
+def load_ann_index(collection_path):
+    """Load the index of a collection, or None when it is missing or out of date."""
+    collection_path = resolve_collection_path(collection_path)
+    try:
+        with np.load(ann_path(collection_path)) as data:
+            if int(data["version"]) != ANN_VERSION:
+                return None
+            if not np.array_equal(data["signature"], _collection_signature(collection_path)):
+                return None
+            return AnnIndex(data["centroids"], data["order"], data["offsets"], data["recall_curve"],
+                            int(data["count"]), data["signature"])
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+
+def build_collection_ann_index(collection_path, **kwargs):
+    """Build and persist the ANN index of a collection file."""
+    collection = load_collection(collection_path)
+    index = build_ann_index(collection.encodings, **kwargs)
+    save_ann_index(collection_path, index)
+    return index
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python ann_index.py <collection_file> [n_lists]")
+        sys.exit(1)
+
+    index = build_collection_ann_index(sys.argv[1], n_lists=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    print(f"✅ ANN index with {index.n_lists} lists saved to '{ann_path(sys.argv[1])}'.")
+    for recall in (0.9, 0.95, 0.99):
+        print(f" - recall {recall:.2f}: probe {index.n_probe_for_recall(recall)} list(s)")
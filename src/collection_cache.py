@@ -0,0 +1,83 @@
+import os
+import threading
+from collections import OrderedDict
+
+from face_collection import journal_path, load_collection, resolve_collection_path
+
+DEFAULT_MEMORY_BUDGET = 1 << 30  # 1 GiB
+# Rough cost of one face in the side table (name, path share, detection pass)
+_TABLE_BYTES_PER_FACE = 200
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _collection_signature(collection_path):
+    """Identify the on-disk state of a collection, journal included."""
+    return _file_signature(collection_path), _file_signature(journal_path(collection_path))
+
+def _estimated_size(collection):
+    arrays = collection.encodings.nbytes + collection.locations.nbytes + collection.path_ids.nbytes
+    return arrays + _TABLE_BYTES_PER_FACE * len(collection)
+
+class CollectionCache:
+    """LRU cache of loaded collections, keyed by path and invalidated on file change.
+
+    Entries are evicted least recently used first once their estimated size
+    exceeds memory_budget. Cached FaceCollection objects are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # path -> (signature, collection, size)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, collection_path):
+        path = os.path.abspath(resolve_collection_path(collection_path))
+        signature = _collection_signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            self._drop(path)
+
+        collection = load_collection(path)
+        size = _estimated_size(collection)
+        with self._lock:
+            if size <= self.memory_budget:
+                self._drop(path)
+                self._entries[path] = (signature, collection, size)
+                self._size += size
+                while self._size > self.memory_budget:
+                    self._drop(next(iter(self._entries)))
+        return collection
+
+    def invalidate(self, collection_path=None):
+        """Forget one collection, or every cached collection when no path is given."""
+        with self._lock:
+            if collection_path is None:
+                self._entries.clear()
+                self._size = 0
+            else:
+                self._drop(os.path.abspath(resolve_collection_path(collection_path)))
+
+    def _drop(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+collection_cache = CollectionCache()
+
+def get_collection(collection_path):
+    """Return a collection through the shared cache, loading it only when it changed."""
+    return collection_cache.get(collection_path)
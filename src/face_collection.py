@@ -0,0 +1,583 @@
+import hashlib
+import json
+import os
+import pickle
+import struct
+import time
+import zlib
+
+import numpy as np
+
+MANIFEST_VERSION = 1
+INFO_VERSION = 1
+FACEDB_SUFFIX = ".facedb"
+FACEDB_MAGIC = b"FACEDB01"
+FACEDB_VERSION = 1
+ENCODING_DIM = 128
+# Arrays in a .facedb file start on 64 byte boundaries so they can be mapped directly
+_FACEDB_ALIGN = 64
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_MAGIC = b"FACEJRN1"
+# Every journal record is framed as (payload length, crc32 of payload) + pickled payload
+_FRAME_HEADER = struct.Struct("<II")
+
+def manifest_path(collection_path):
+    return collection_path + ".manifest.json"
+
+def info_path(collection_path):
+    return collection_path + ".info.json"
+
+def journal_path(collection_path):
+    return collection_path + JOURNAL_SUFFIX
+
+def resolve_collection_path(path):
+    """Accept either a collection file or its journal and return the collection path."""
+    return path[:-len(JOURNAL_SUFFIX)] if path.endswith(JOURNAL_SUFFIX) else path
+
+def _atomic_write(path, write):
+    """Write a file through a temporary sibling and rename it into place."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _load_base_faces(collection_path):
+    with open(collection_path, "rb") as f:
+        return pickle.load(f)
+
+def _replay(faces, manifest, records):
+    """Apply journal records on top of a face list and manifest (updated in place).
+
+    An "image" record replaces every face previously stored for its image,
+    "remove" drops them and "reset" discards everything recorded before it.
+    """
+    by_path = {}
+    for face in faces:
+        by_path.setdefault(face["image_path"], []).append(face)
+    for record in records:
+        if record["type"] == "reset":
+            by_path.clear()
+            manifest.clear()
+        elif record["type"] == "image":
+            by_path.pop(record["image_path"], None)
+            by_path[record["image_path"]] = record["faces"]
+            manifest[record["image_path"]] = record["manifest"]
+        elif record["type"] == "remove":
+            by_path.pop(record["image_path"], None)
+            manifest.pop(record["image_path"], None)
+    return [face for path_faces in by_path.values() for face in path_faces]
+
+class FaceCollection:
+    """Columnar view of a face collection.
+
+    Encodings are one contiguous (N, 128) float32 matrix, locations an (N, 4)
+    int32 matrix and path_ids the row of each face in the side table, which
+    holds the unique image paths, the per-face names and the per-image
+    detection passes. For .facedb files the arrays are memory-mapped and the
+    side table is only parsed the first time it is used.
+    """
+
+    def __init__(self, encodings, locations, path_ids, table=None, table_loader=None, header=None):
+        self.encodings = encodings
+        self.locations = locations
+        self.path_ids = path_ids
+        self._table = table
+        self._table_loader = table_loader
+        self.header = header or {}
+
+    @classmethod
+    def empty(cls):
+        return cls.from_faces([])
+
+    @classmethod
+    def from_faces(cls, faces):
+        """Build a collection from legacy face entry dicts."""
+        path_index = {}
+        table = {"paths": [], "names": [], "detection_passes": []}
+        path_ids = np.empty(len(faces), dtype=np.int32)
+        for row, face in enumerate(faces):
+            image_path = face["image_path"]
+            if image_path not in path_index:
+                path_index[image_path] = len(table["paths"])
+                table["paths"].append(image_path)
+                table["detection_passes"].append(face.get("detection_pass"))
+            path_ids[row] = path_index[image_path]
+            table["names"].append(face["name"])
+        encodings = np.array([face["encoding"] for face in faces], dtype=np.float32).reshape(-1, ENCODING_DIM)
+        locations = np.array([face["location"] for face in faces], dtype=np.int32).reshape(-1, 4)
+        return cls(encodings, locations, path_ids, table=table)
+
+    @classmethod
+    def concat(cls, collections):
+        """Stack several collections into one in-memory collection.
+
+        An image path found in several collections keeps a single entry in
+        the side table.
+        """
+        table = {"paths": [], "names": [], "detection_passes": []}
+        path_index = {}
+        path_ids = []
+        for collection in collections:
+            remap = np.empty(len(collection.paths), dtype=np.int32)
+            for i, (image_path, detection_pass) in enumerate(zip(collection.paths, collection.table["detection_passes"])):
+                if image_path not in path_index:
+                    path_index[image_path] = len(table["paths"])
+                    table["paths"].append(image_path)
+                    table["detection_passes"].append(detection_pass)
+                remap[i] = path_index[image_path]
+            path_ids.append(remap[np.asarray(collection.path_ids)])
+            table["names"].extend(collection.names)
+        return cls(np.concatenate([c.encodings for c in collections]).astype(np.float32, copy=False).reshape(-1, ENCODING_DIM),
+                   np.concatenate([c.locations for c in collections]).astype(np.int32, copy=False).reshape(-1, 4),
+                   np.concatenate(path_ids).astype(np.int32, copy=False),
+                   table=table)
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = self._table_loader()
+        return self._table
+
+    @property
+    def paths(self):
+        return self.table["paths"]
+
+    @property
+    def names(self):
+        return self.table["names"]
+
+    def __len__(self):
+        return len(self.encodings)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.entry(row)
+
+    def image_path(self, row):
+        return self.paths[self.path_ids[row]]
+
+    def entry(self, row):
+        """Return face row as a legacy entry dict."""
+        path_id = int(self.path_ids[row])
+        return {
+            "name": self.names[row],
+            "encoding": np.array(self.encodings[row]),
+            "image_path": self.paths[path_id],
+            "location": tuple(int(v) for v in self.locations[row]),
+            "detection_pass": self.table["detection_passes"][path_id],
+        }
+
+    def to_faces(self):
+        return list(self)
+
+    def select(self, rows):
+        """Return an in-memory collection holding only the given rows (index array or mask)."""
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows, dtype=np.int64)
+        used, path_ids = np.unique(np.asarray(self.path_ids)[rows], return_inverse=True)
+        table = {
+            "paths": [self.paths[i] for i in used],
+            "names": [self.names[row] for row in rows],
+            "detection_passes": [self.table["detection_passes"][i] for i in used],
+        }
+        return FaceCollection(np.asarray(self.encodings)[rows], np.asarray(self.locations)[rows],
+                              path_ids.astype(np.int32), table=table)
+
+def _apply_journal(collection, records):
+    """Apply journal records to a FaceCollection without expanding it into dicts."""
+    if not records:
+        return collection
+    if any(record["type"] == "reset" for record in records):
+        last_reset = max(i for i, record in enumerate(records) if record["type"] == "reset")
+        collection, records = FaceCollection.empty(), records[last_reset + 1:]
+    touched = {record["image_path"] for record in records}
+    touched_ids = [i for i, path in enumerate(collection.paths) if path in touched]
+    kept = collection.select(~np.isin(collection.path_ids, touched_ids)) if touched_ids else collection
+    added = FaceCollection.from_faces(_replay([], {}, records))
+    return FaceCollection.concat([kept, added]) if len(added) else kept
+
+def _write_facedb(f, collection):
+    arrays = {
+        "encodings": np.ascontiguousarray(collection.encodings, dtype="<f4"),
+        "locations": np.ascontiguousarray(collection.locations, dtype="<i4"),
+        "path_ids": np.ascontiguousarray(collection.path_ids, dtype="<i4"),
+    }
+    table = json.dumps(collection.table).encode("utf-8")
+
+    # Offsets are relative to the start of the data section, which follows the header
+    header = {"format": "facedb", "version": FACEDB_VERSION, "count": len(collection), "dim": ENCODING_DIM,
+              "images": len(collection.paths), "arrays": {}, "table": {}}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += -(-array.nbytes // _FACEDB_ALIGN) * _FACEDB_ALIGN
+    header["table"] = {"offset": offset, "length": len(table)}
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    f.write(FACEDB_MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes)
+    data_start = -(-f.tell() // _FACEDB_ALIGN) * _FACEDB_ALIGN
+    for name, array in arrays.items():
+        f.write(b"\0" * (data_start + header["arrays"][name]["offset"] - f.tell()))
+        f.write(array.tobytes())
+    f.write(b"\0" * (data_start + header["table"]["offset"] - f.tell()))
+    f.write(table)
+
+def read_facedb_header(path):
+    """Return (header, data_start) of a .facedb file without reading its data."""
+    with open(path, "rb") as f:
+        if f.read(len(FACEDB_MAGIC)) != FACEDB_MAGIC:
+            raise ValueError(f"Not a face collection file: {path}")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length).decode("utf-8"))
+        data_start = -(-f.tell() // _FACEDB_ALIGN) * _FACEDB_ALIGN
+    return header, data_start
+
+def _load_facedb(path):
+    header, data_start = read_facedb_header(path)
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        if header["count"]:
+            arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r", offset=data_start + spec["offset"], shape=shape)
+        else:
+            arrays[name] = np.empty(shape, dtype=spec["dtype"])
+
+    def load_table():
+        with open(path, "rb") as f:
+            f.seek(data_start + header["table"]["offset"])
+            return json.loads(f.read(header["table"]["length"]).decode("utf-8"))
+
+    return FaceCollection(arrays["encodings"], arrays["locations"], arrays["path_ids"],
+                          table_loader=load_table, header=header)
+
+def load_collection(collection_path):
+    """Load a collection as a FaceCollection.
+
+    .facedb files are memory-mapped; legacy .pkl collections are converted.
+    Checkpointed journal records of an unfinished run are applied on top.
+    """
+    collection_path = resolve_collection_path(collection_path)
+    if not collection_path.endswith(FACEDB_SUFFIX):
+        return FaceCollection.from_faces(load_faces(collection_path))
+    records, committed = read_journal(collection_path)
+    if committed and not os.path.exists(collection_path):
+        return _apply_journal(FaceCollection.empty(), records)
+    return _apply_journal(_load_facedb(collection_path), records)
+
+def save_collection(collection_path, collection):
+    if collection_path.endswith(FACEDB_SUFFIX):
+        _atomic_write(collection_path, lambda f: _write_facedb(f, collection))
+    else:
+        save_faces(collection_path, collection.to_faces())
+
+def load_faces(collection_path):
+    """Load the list of face entries of a collection.
+
+    Records of an unfinished indexing run are read from the journal up to its
+    last checkpoint, so a collection stays readable after a crash.
+    """
+    collection_path = resolve_collection_path(collection_path)
+    if collection_path.endswith(FACEDB_SUFFIX):
+        return load_collection(collection_path).to_faces()
+    records, committed = read_journal(collection_path)
+    if not committed:
+        return _load_base_faces(collection_path)
+    faces = []
+    if os.path.exists(collection_path) and not (records and records[0]["type"] == "reset"):
+        faces = _load_base_faces(collection_path)
+    return _replay(faces, {}, records)
+
+def save_faces(collection_path, faces):
+    if collection_path.endswith(FACEDB_SUFFIX):
+        save_collection(collection_path, FaceCollection.from_faces(faces))
+    else:
+        _atomic_write(collection_path, lambda f: pickle.dump(faces, f))
+
+def _load_manifest_file(collection_path):
+    try:
+        with open(manifest_path(collection_path), "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except FileNotFoundError:
+        return {}
+
+def load_manifest(collection_path):
+    """Return the {image_path: entry} manifest of a collection, or {} if it has none."""
+    collection_path = resolve_collection_path(collection_path)
+    manifest = _load_manifest_file(collection_path)
+    records, _ = read_journal(collection_path)
+    _replay([], manifest, records)
+    return manifest
+
+def save_manifest(collection_path, manifest):
+    data = {"version": MANIFEST_VERSION, "files": manifest}
+    _atomic_write(manifest_path(collection_path), lambda f: f.write(json.dumps(data).encode("utf-8")))
+
+def update_manifest_entries(collection_path, entries):
+    """Write some {image_path: entry} entries to the manifest file, e.g. those refreshed by needs_indexing.
+
+    The collection itself is left alone; journal records still apply on top
+    of the manifest file when it is loaded.
+    """
+    manifest = _load_manifest_file(collection_path)
+    manifest.update(entries)
+    save_manifest(collection_path, manifest)
+
+def _collection_format(collection_path):
+    if collection_path.endswith(FACEDB_SUFFIX):
+        return "facedb", FACEDB_VERSION
+    return "pkl", None
+
+def read_collection_info(collection_path):
+    """Return the info sidecar of a collection, or None if it has none.
+
+    The sidecar is a small JSON file holding the face and image counts, the
+    source roots, the detector settings, the creation and update times and
+    the format of the collection, so collections can be listed without being
+    loaded. A .facedb file without one is described from its header.
+    """
+    collection_path = resolve_collection_path(collection_path)
+    try:
+        with open(info_path(collection_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    if collection_path.endswith(FACEDB_SUFFIX) and os.path.exists(collection_path):
+        header, _ = read_facedb_header(collection_path)
+        created = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(os.path.getmtime(collection_path)))
+        return {"version": INFO_VERSION, "format": "facedb", "format_version": header["version"],
+                "faces": header["count"], "images": header.get("images"),
+                "source_roots": [], "detector": None, "created": created, "updated": created}
+    return None
+
+def write_collection_info(collection_path, collection=None, source_roots=(), detector=None):
+    """Write the info sidecar of a collection (see read_collection_info) and return it.
+
+    Counts come from collection, loaded when not given. Source roots are
+    added to those already recorded (a collection with none, e.g. a legacy
+    one, gets the common folder of its images), the creation time is kept
+    and the detector settings are replaced when given.
+    """
+    collection_path = resolve_collection_path(collection_path)
+    if collection is None:
+        collection = load_collection(collection_path)
+    try:
+        with open(info_path(collection_path), "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    source_roots = set(previous.get("source_roots", [])) | set(source_roots)
+    if not source_roots and len(collection.paths):
+        try:
+            source_roots = {os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in collection.paths])}
+        except ValueError:
+            pass  # Paths on different drives
+    now = time.strftime("%Y-%m-%dT%H:%M:%S")
+    created = previous.get("created")
+    if created is None:
+        # Without a sidecar, the file's mtime is the best guess (now, for a collection just written)
+        created = now
+        if os.path.exists(collection_path):
+            created = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(os.path.getmtime(collection_path)))
+    collection_format, format_version = _collection_format(collection_path)
+    info = {
+        "version": INFO_VERSION,
+        "format": collection_format,
+        "format_version": format_version,
+        "faces": len(collection),
+        "images": len(collection.paths),
+        "source_roots": sorted(source_roots),
+        "detector": detector if detector is not None else previous.get("detector"),
+        "created": created,
+        "updated": now,
+    }
+    _atomic_write(info_path(collection_path), lambda f: f.write(json.dumps(info, indent=1).encode("utf-8")))
+    return info
+
+def list_collections(directory):
+    """Return (collection_path, info or None) for every collection in directory, sorted by name.
+
+    Only the info sidecars (or .facedb headers) are read.
+    """
+    try:
+        with os.scandir(directory) as it:
+            paths = sorted(entry.path for entry in it
+                           if entry.is_file() and entry.name.endswith((FACEDB_SUFFIX, ".pkl")))
+    except FileNotFoundError:
+        return []
+    collections = []
+    for path in paths:
+        try:
+            info = read_collection_info(path)
+        except (OSError, ValueError):
+            info = None
+        collections.append((path, info))
+    return collections
+
+def file_hash(path, chunk_size=1 << 20):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def manifest_entry(stat, sha1, face_count, detection_pass=None):
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha1": sha1,
+        "faces": face_count,
+        "detection_pass": detection_pass,
+    }
+
+def needs_indexing(image_path, manifest, refreshed=None):
+    """Tell whether an image is new or changed since the manifest was written.
+
+    Size and mtime are compared first; the content hash is only computed when
+    they differ, so a touched but identical file is not processed again. Its
+    manifest entry gets the new mtime and is also added to the refreshed
+    dict, for the caller to persist with update_manifest_entries so the file
+    is not hashed again on the next run.
+    """
+    entry = manifest.get(image_path)
+    if entry is None:
+        return True
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return True
+    if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        return False
+    if entry.get("sha1") and entry["size"] == stat.st_size and file_hash(image_path) == entry["sha1"]:
+        entry["mtime"] = stat.st_mtime
+        if refreshed is not None:
+            refreshed[image_path] = entry
+        return False
+    return True
+
+def read_journal(collection_path):
+    """Return (records, committed_offset) of a collection journal.
+
+    Only records followed by a checkpoint are returned; anything after the
+    last checkpoint, including a torn or corrupt frame, is ignored.
+    """
+    try:
+        f = open(journal_path(collection_path), "rb")
+    except FileNotFoundError:
+        return [], 0
+    with f:
+        if f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+            return [], 0
+        records, pending = [], []
+        offset = committed = len(JOURNAL_MAGIC)
+        while True:
+            header = f.read(_FRAME_HEADER.size)
+            if len(header) < _FRAME_HEADER.size:
+                break
+            length, crc = _FRAME_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            offset += _FRAME_HEADER.size + length
+            record = pickle.loads(payload)
+            if record["type"] == "checkpoint":
+                records.extend(pending)
+                pending = []
+                committed = offset
+            else:
+                pending.append(record)
+    return records, committed
+
+class CollectionJournal:
+    """Append-only log of indexing results for one collection.
+
+    Records are appended as they are produced and made durable by periodic
+    checkpoints (every checkpoint_every records or checkpoint_interval
+    seconds). Reopening an existing journal drops anything after its last
+    checkpoint and continues from there, unless reset is set, in which case
+    the journal starts over and hides the current collection contents.
+    """
+
+    def __init__(self, collection_path, reset=False, checkpoint_every=100, checkpoint_interval=30.0):
+        self.path = journal_path(collection_path)
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+
+        _, committed = (([], 0) if reset else read_journal(collection_path))
+        if committed:
+            self._file = open(self.path, "r+b")
+            self._file.truncate(committed)
+            self._file.seek(committed)
+        else:
+            self._file = open(self.path, "wb")
+            self._file.write(JOURNAL_MAGIC)
+            if reset:
+                self.append({"type": "reset"})
+            self.checkpoint()
+
+    def _write(self, record):
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(_FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+
+    def append(self, record):
+        self._write(record)
+        self._pending += 1
+        if (self._pending >= self.checkpoint_every
+                or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval):
+            self.checkpoint()
+
+    def checkpoint(self):
+        # The records must be on disk before the checkpoint that commits them
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._write({"type": "checkpoint"})
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self._pending:
+            self.checkpoint()
+        self._file.close()
+
+def compact_collection(collection_path, source_roots=(), detector=None):
+    """Fold the journal into the collection file and manifest, then drop it.
+
+    The info sidecar is refreshed, with source_roots and detector recorded
+    (see write_collection_info). A journal without committed records leaves
+    the collection untouched, so its mtime (and the ANN index tied to it)
+    survives incremental runs that found nothing to do. Returns the number of
+    faces in the compacted collection.
+    """
+    records, _ = read_journal(collection_path)
+    info = read_collection_info(collection_path) if os.path.exists(collection_path) else None
+    if not records and info is not None:
+        if os.path.exists(journal_path(collection_path)):
+            os.remove(journal_path(collection_path))
+        return info["faces"]
+
+    # A file still mapped by the search cache cannot be replaced on Windows
+    from collection_cache import collection_cache  # Imported here, it imports this module
+    collection_cache.invalidate(collection_path)
+    if collection_path.endswith(FACEDB_SUFFIX):
+        collection = load_collection(collection_path)
+        if isinstance(collection.encodings, np.memmap):
+            # Copy out of the mapping so the file can be replaced on every platform
+            collection = collection.select(np.arange(len(collection)))
+        save_collection(collection_path, collection)
+    else:
+        faces = load_faces(collection_path)
+        save_faces(collection_path, faces)
+        collection = FaceCollection.from_faces(faces)
+    face_count = len(collection)
+    write_collection_info(collection_path, collection, source_roots, detector)
+    del collection
+    save_manifest(collection_path, load_manifest(collection_path))
+    if os.path.exists(journal_path(collection_path)):
+        os.remove(journal_path(collection_path))
+    return face_count
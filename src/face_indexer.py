@@ -1,63 +1,490 @@
 from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+import queue
+import argparse
+import hashlib
+import io
 import face_recognition
-import pickle
 import os
 from PIL import Image
 from tqdm import tqdm
 import numpy as np
 
-def index_faces(image_paths, index_file=None, max_faces_per_image=4, progress_callback=None, preview_callback=None):
-    encoded_faces = []
-    for idx, image_path in enumerate(tqdm(image_paths, desc="Indexing faces", unit="img")):
-        filename = os.path.basename(image_path)
-        name_prefix = os.path.splitext(filename)[0]
+from face_collection import (FACEDB_SUFFIX, CollectionJournal, compact_collection, file_hash, info_path,
+                             load_manifest, manifest_entry, manifest_path, needs_indexing, update_manifest_entries)
+from ann_index import ann_path, build_collection_ann_index, load_ann_index
+from thumbnail_store import ThumbnailStore, encode_thumbnails, thumbs_index_path, thumbs_path
+from utils.file_utils import collect_image_paths, IMG_EXTENSIONS, RAW_EXTENSIONS
 
+_STOP = object()
+
+# Detection passes tried in order by the "adaptive" mode: (longest side in
+# pixels, upsample count). None means the original resolution, which makes the
+# last pass identical to the "full" mode.
+ADAPTIVE_DETECTION_PASSES = [(1024, 1), (2048, 1), (None, 1)]
+
+def _pass_label(max_side, upsample):
+    label = "full" if max_side is None else f"{max_side}px"
+    return label if upsample == 1 else f"{label}-up{upsample}"
+
+def _detect_faces(image, detection="full", detection_passes=None):
+    """Return (face_locations, detection_pass) for an RGB image.
+
+    "full" runs HOG once on the original image. "adaptive" detects on a
+    downscaled copy first and only escalates to the next pass when nothing is
+    found; boxes are always mapped back to original image coordinates so the
+    encodings are computed from the full resolution image.
+    """
+    if detection == "full":
+        return face_recognition.face_locations(image), "full"
+    if detection != "adaptive":
+        raise ValueError(f"Unknown detection mode: {detection}")
+
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    face_locations = []
+    label = None
+    for max_side, upsample in (detection_passes or ADAPTIVE_DETECTION_PASSES):
+        if max_side is not None and max_side >= longest:
+            max_side = None
+        if _pass_label(max_side, upsample) == label:
+            continue  # same as the pass that just failed
+        label = _pass_label(max_side, upsample)
+
+        if max_side is None:
+            face_locations = face_recognition.face_locations(image, number_of_times_to_upsample=upsample)
+        else:
+            scale = max_side / longest
+            small = Image.fromarray(image).resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR)
+            face_locations = [
+                (max(0, int(top / scale)), min(width, int(right / scale)), min(height, int(bottom / scale)), max(0, int(left / scale)))
+                for top, right, bottom, left in face_recognition.face_locations(np.asarray(small), number_of_times_to_upsample=upsample)
+            ]
+        if face_locations:
+            break
+    return face_locations, label
+
+def _encode_faces(image, face_locations, max_faces_per_image=4, with_previews=False):
+    """Encode the detected faces of an image into (encoding, location, face_crop) tuples."""
+    encodings = face_recognition.face_encodings(image, face_locations)
+
+    faces = []
+    for i, encoding in enumerate(encodings[:max_faces_per_image]):
+        face_image_np = None
+        if with_previews:
+            top, right, bottom, left = face_locations[i]
+            face_image_np = np.array(image[top:bottom, left:right])
+        faces.append((encoding, face_locations[i], face_image_np))
+    return faces
+
+def _load_image(image_path):
+    """Read an image once and return its decoded RGB array with the sha1 of the file."""
+    with open(image_path, "rb") as f:
+        data = f.read()
+    return face_recognition.load_image_file(io.BytesIO(data)), hashlib.sha1(data).hexdigest()
+
+def _split_source(item):
+    """Return (image_path, source) for an item of index_faces' image_paths."""
+    if isinstance(item, tuple):
+        return item
+    return item, None
+
+def _load_source(image_path, source, options):
+    """Return (image, sha1, scale, load_report) for one image, whatever its source.
+
+    source is None (the image_loader option, or reading the file), an RGB
+    array already decoded from image_path, or a loader callable for this
+    path. Loaders return (image, sha1), (image, sha1, scale) or (image, sha1,
+    scale, load_report), scale mapping the image coordinates back to those of
+    the original image and load_report describing a RAW decode (see
+    raw_converter.load_raw_image).
+    """
+    if source is None:
+        source = options.get("image_loader") or _load_image
+    if callable(source):
+        loaded = tuple(source(image_path))
+        return loaded + (1.0, None)[len(loaded) - 2:]
+    return np.asarray(source), file_hash(image_path), 1.0, None
+
+def _scale_location(location, scale):
+    return tuple(int(round(value * scale)) for value in location)
+
+def _thumbnails(image, image_path, faces, options):
+    """Thumbnails for the collection's ThumbnailStore, when enabled and the image has faces."""
+    if not options.get("thumbnails") or not faces:
+        return None
+    return encode_thumbnails(image, image_path, [location for _, location, _ in faces])
+
+def _result(face_locations=(), faces=(), detection_pass=None, sha1=None, error=None, scale=1.0, thumbnails=None,
+            load_report=None):
+    # Locations are reported in original image coordinates; face crops stay as decoded
+    if scale != 1.0:
+        face_locations = [_scale_location(location, scale) for location in face_locations]
+        faces = [(encoding, _scale_location(location, scale), crop) for encoding, location, crop in faces]
+    return {
+        "face_locations": list(face_locations),
+        "faces": list(faces),
+        "detection_pass": detection_pass,
+        "sha1": sha1,
+        "error": error,
+        "thumbnails": thumbnails,
+        "load_report": load_report,
+    }
+
+def _process_image(image_path, options, source=None):
+    """Detect and encode the faces of one image.
+
+    Runs either inline or inside a worker process, so it only returns plain
+    picklable data (see _result). Each face is an (encoding, location,
+    face_crop) tuple.
+    """
+    try:
+        image, sha1, scale, load_report = _load_source(image_path, source, options)
+        face_locations, detection_pass = _detect_faces(image, options["detection"], options["detection_passes"])
+        faces = _encode_faces(image, face_locations, options["max_faces_per_image"], options["with_previews"])
+        thumbnails = _thumbnails(image, image_path, faces, options)
+        return _result(face_locations, faces, detection_pass, sha1, scale=scale, thumbnails=thumbnails,
+                       load_report=load_report)
+    except Exception as e:
+        return _result(error=str(e))
+
+def _put(q, item, stop_event):
+    """Blocking put that gives up once the consumer has gone away."""
+    while not stop_event.is_set():
         try:
-            image = face_recognition.load_image_file(image_path)
-            face_locations = face_recognition.face_locations(image)
-            encodings = face_recognition.face_encodings(image, face_locations)
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
 
-            if not encodings:
-                print(f"[Warning] No face found in {filename}, (face_locations: {face_locations})")
-                if progress_callback:
-                    progress_callback(idx + 1, len(image_paths))
-                if preview_callback:
-                    preview_callback(None, image_path, "NO FACES FOUND")
+def _get(q, stop_event):
+    """Blocking get that returns _STOP once the consumer has gone away."""
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _STOP
+
+class _StageFailed:
+    """Queue sentinel carrying an exception that ended a pipeline stage, re-raised by the consumer."""
+
+    def __init__(self, exception):
+        self.exception = exception
+
+def _decode_stage(image_paths, out_queue, stop_event, options):
+    try:
+        # The input may be a generator: errors raised while iterating it, or
+        # by a malformed item, end the stage and are handed to the consumer
+        for image_path, source in map(_split_source, image_paths):
+            try:
+                image, sha1, scale, load_report = _load_source(image_path, source, options)
+                item = (image_path, image, sha1, scale, load_report, None)
+            except Exception as e:
+                item = (image_path, None, None, 1.0, None, str(e))
+            if not _put(out_queue, item, stop_event):
+                return
+    except BaseException as e:
+        _put(out_queue, _StageFailed(e), stop_event)
+        return
+    _put(out_queue, _STOP, stop_event)
+
+def _detect_stage(in_queue, out_queue, stop_event, options):
+    try:
+        while True:
+            item = _get(in_queue, stop_event)
+            if item is _STOP:
+                break
+            if isinstance(item, _StageFailed):
+                _put(out_queue, item, stop_event)
+                return
+            image_path, image, sha1, scale, load_report, error = item
+            face_locations, detection_pass = [], None
+            if error is None:
+                try:
+                    face_locations, detection_pass = _detect_faces(image, options["detection"], options["detection_passes"])
+                except Exception as e:
+                    image, error = None, str(e)
+            item = (image_path, image, sha1, scale, load_report, face_locations, detection_pass, error)
+            if not _put(out_queue, item, stop_event):
+                return
+    except BaseException as e:
+        _put(out_queue, _StageFailed(e), stop_event)
+        return
+    _put(out_queue, _STOP, stop_event)
+
+def _iter_pipelined(image_paths, options, prefetch, detect_queue):
+    """Yield (image_path, result) pairs from a decode -> detect -> encode pipeline.
+
+    Decoding and detection run in their own threads and hand images over
+    through bounded queues, so reading the next files overlaps with the work
+    on the current one while at most prefetch + detect_queue decoded images
+    are held in memory. Encoding runs in the consuming thread.
+    """
+    decoded = queue.Queue(maxsize=max(1, prefetch))
+    detected = queue.Queue(maxsize=max(1, detect_queue))
+    stop_event = threading.Event()
+    stages = [
+        threading.Thread(target=_decode_stage, args=(image_paths, decoded, stop_event, options), daemon=True),
+        threading.Thread(target=_detect_stage, args=(decoded, detected, stop_event, options), daemon=True),
+    ]
+    for stage in stages:
+        stage.start()
+
+    try:
+        while True:
+            try:
+                item = detected.get(timeout=0.5)
+            except queue.Empty:
+                # Every stage hands over _STOP or a failure before exiting, so this is only a safety net
+                if not any(stage.is_alive() for stage in stages) and detected.empty():
+                    raise RuntimeError("Indexing pipeline stopped unexpectedly")
                 continue
+            if item is _STOP:
+                break
+            if isinstance(item, _StageFailed):
+                raise item.exception
+            image_path, image, sha1, scale, load_report, face_locations, detection_pass, error = item
+            if error is not None:
+                yield image_path, _result(error=error)
+                continue
+            try:
+                faces = _encode_faces(image, face_locations, options["max_faces_per_image"], options["with_previews"])
+                thumbnails = _thumbnails(image, image_path, faces, options)
+                yield image_path, _result(face_locations, faces, detection_pass, sha1, scale=scale, thumbnails=thumbnails,
+                                          load_report=load_report)
+            except Exception as e:
+                yield image_path, _result(error=str(e))
+    finally:
+        stop_event.set()
 
-            for i, encoding in enumerate(encodings[:max_faces_per_image]):
-                encoded_faces.append({
-                    "name": f"{name_prefix}_{i}",
-                    "encoding": encoding,
-                    "image_path": image_path,
-                    "location": face_locations[i]
-                })
+def _iter_processed(image_paths, options, workers=1, prefetch=2, detect_queue=2):
+    """Yield (image_path, result) pairs in input order.
 
-                if preview_callback:
-                    top, right, bottom, left = face_locations[i]
-                    face_image = image[top:bottom, left:right]
-                    face_image_np = np.array(face_image)
-    
-                    preview_callback(face_image_np, image_path, f"{name_prefix}_{i}")
-                        
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
-
-        # Update progress
-        if progress_callback:
-            progress_callback(idx + 1, len(image_paths))
-    # Generate default index file name if not provided
-
-    if index_file is None: # TODO remove this part and just dont save if it 
+    With workers > 1 images are spread over a process pool. At most
+    workers + prefetch images are in flight, and results are handed back
+    strictly in submission order so the collection layout does not depend
+    on timing. A single worker uses the threaded pipeline unless prefetch is 0.
+    """
+    if workers <= 1:
+        if prefetch > 0:
+            yield from _iter_pipelined(image_paths, options, prefetch, detect_queue)
+            return
+        for image_path, source in map(_split_source, image_paths):
+            yield image_path, _process_image(image_path, options, source)
+        return
+
+    # spawn keeps the workers independent from the Tk thread state of the GUI
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = deque()
+        for image_path, source in map(_split_source, image_paths):
+            pending.append((image_path, executor.submit(_process_image, image_path, options, source)))
+            if len(pending) >= workers + max(1, prefetch):
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+def index_faces(image_paths, index_file=None, max_faces_per_image=4, progress_callback=None, preview_callback=None, workers=1,
+                prefetch=2, detect_queue=2, detection="full", detection_passes=None, incremental=False,
+                checkpoint_every=100, checkpoint_interval=30.0, build_ann=False, total=None, image_loader=None,
+                removed_paths=(), thumbnails=False, source_root=None, raw_stats=None):
+    # image_paths may also be a generator (e.g. RAW conversions streamed as they finish),
+    # in which case total gives the expected number of images for progress reporting.
+    # Items are paths or (path, source) pairs where source is an RGB array already decoded
+    # from path or a loader callable for it (see _load_source); image_loader replaces
+    # file decoding for every plain path. The path is what gets recorded for each face.
+    # removed_paths are images (e.g. deleted files) whose faces are dropped from an
+    # incrementally updated collection.
+    # With thumbnails, face crops and a small thumbnail of each source image are saved in
+    # a ThumbnailStore next to the collection while the decoded image is at hand.
+    # source_root is the folder recorded in the collection's info sidecar, by default the
+    # common folder of the images indexed in this run.
+    # Loaders that report how they decoded a RAW file get a line per file, and their reports
+    # are added to raw_stats (a raw_converter.ConversionStats, created when needed).
+    if total is None:
+        total = len(image_paths)
+    if incremental and index_file is None:
+        raise ValueError("Incremental indexing needs the index_file of the collection to update")
+    if removed_paths and not incremental:
+        raise ValueError("removed_paths only applies to incremental indexing")
+
+    # Generate a working file name if not provided, renamed with the face count once done
+    timestamp = None
+    if index_file is None: # TODO remove this part and just dont save if it
         output_dir = os.path.join(os.getcwd(), "faces_indexed")
         os.makedirs(output_dir, exist_ok=True)
 
         timestamp = datetime.now().strftime("%Y-%m-%d--%Hh-%Mm-%Ss")
-        file_name = f"{len(encoded_faces)}-faces-{timestamp}.pkl"
-        index_file = os.path.join(output_dir, file_name)
+        index_file = os.path.join(output_dir, f"faces-{timestamp}{FACEDB_SUFFIX}")
+
+    refreshed = {}  # Manifest entries of touched but unchanged images, saved once the input is consumed
+    if incremental:
+        manifest = load_manifest(index_file)
+        if hasattr(image_paths, "__len__"):
+            image_paths = [p for p in image_paths if needs_indexing(_split_source(p)[0], manifest, refreshed)]
+            print(f"Skipping {total - len(image_paths)} unchanged image(s), indexing {len(image_paths)}.")
+            total = len(image_paths)
+        else:
+            image_paths = (p for p in image_paths if needs_indexing(_split_source(p)[0], manifest, refreshed))
+
+    options = {
+        "max_faces_per_image": max_faces_per_image,
+        "with_previews": preview_callback is not None,
+        "detection": detection,
+        "detection_passes": detection_passes,
+        "image_loader": image_loader,
+        "thumbnails": thumbnails,
+    }
+    detection_stats = {}
+    indexed_dirs = set()
+    # Results are streamed to the journal as they come in; a fresh run resets it
+    journal = CollectionJournal(index_file, reset=not incremental,
+                                checkpoint_every=checkpoint_every, checkpoint_interval=checkpoint_interval)
+    store = ThumbnailStore(index_file, reset=not incremental) if thumbnails else None
+    try:
+        for image_path in removed_paths:
+            journal.append({"type": "remove", "image_path": image_path})
+        if removed_paths:
+            print(f"Removing {len(removed_paths)} image(s) from the collection.")
+
+        results = _iter_processed(image_paths, options, workers=workers, prefetch=prefetch, detect_queue=detect_queue)
+        for idx, (image_path, result) in enumerate(tqdm(results, total=total, desc="Indexing faces", unit="img")):
+            filename = os.path.basename(image_path)
+            name_prefix = os.path.splitext(filename)[0]
+            indexed_dirs.add(os.path.dirname(os.path.abspath(image_path)))
+            faces = result["faces"]
+            detection_pass = result["detection_pass"]
+
+            load_report = result["load_report"]
+            if load_report is not None:
+                from raw_converter import ConversionStats, report_line
+                if raw_stats is None:
+                    raw_stats = ConversionStats()
+                tqdm.write(report_line(load_report, raw_stats.add(load_report)))
+
+            stat = None
+            if result["error"] is None:
+                try:
+                    stat = os.stat(image_path)
+                except OSError as e:
+                    # Deleted or moved since it was read (e.g. during a watch batch), a later run picks it up
+                    result["error"] = str(e)
+            if result["error"] is not None:
+                print(f"Error processing {filename}: {result['error']}")
+                if progress_callback:
+                    progress_callback(idx + 1, total)
+                continue
+
+            stats_key = detection_pass if faces else "none"
+            detection_stats[stats_key] = detection_stats.get(stats_key, 0) + 1
+            encoded_faces = [{
+                "name": f"{name_prefix}_{i}",
+                "encoding": encoding,
+                "image_path": image_path,
+                "location": location,
+                "detection_pass": detection_pass
+            } for i, (encoding, location, _) in enumerate(faces)]
+            journal.append({
+                "type": "image",
+                "image_path": image_path,
+                "manifest": manifest_entry(stat, result["sha1"], len(faces), detection_pass),
+                "faces": encoded_faces,
+            })
+            if store is not None and result["thumbnails"] is not None:
+                store.add_image(image_path, [face["location"] for face in encoded_faces], result["thumbnails"])
+
+            if not faces:
+                print(f"[Warning] No face found in {filename}, (face_locations: {result['face_locations']})")
+                if progress_callback:
+                    progress_callback(idx + 1, total)
+                if preview_callback:
+                    preview_callback(None, image_path, "NO FACES FOUND")
+                continue
+
+            if preview_callback:
+                for face, (_, _, face_image_np) in zip(encoded_faces, faces):
+                    preview_callback(face_image_np, image_path, face["name"])
+
+            # Update progress
+            if progress_callback:
+                progress_callback(idx + 1, total)
+    finally:
+        journal.close()
+        if store is not None:
+            store.close()
+
+    if refreshed:
+        update_manifest_entries(index_file, refreshed)
+    # Fold the journal into the collection and the manifest used by later incremental runs
+    if source_root is None and indexed_dirs:
+        source_root = os.path.commonpath(sorted(indexed_dirs))
+    detector = {"detection": detection, "detection_passes": detection_passes,
+                "max_faces_per_image": max_faces_per_image}
+    face_count = compact_collection(index_file, [os.path.abspath(source_root)] if source_root else (), detector)
+    if store is not None:
+        # Thumbnails of removed or re-indexed images are dropped with them
+        freed = store.compact(load_manifest(index_file))
+        if freed:
+            print(f"Thumbnail store compacted, {freed / (1 << 20):.1f} MiB freed.")
+    if timestamp is not None:
+        final_file = os.path.join(os.path.dirname(index_file), f"{face_count}-faces-{timestamp}{FACEDB_SUFFIX}")
+        os.replace(index_file, final_file)
+        os.replace(manifest_path(index_file), manifest_path(final_file))
+        os.replace(info_path(index_file), info_path(final_file))
+        if store is not None and os.path.exists(thumbs_index_path(index_file)):
+            os.replace(thumbs_path(index_file), thumbs_path(final_file))
+            os.replace(thumbs_index_path(index_file), thumbs_index_path(final_file))
+        index_file = final_file
+
+    # An existing ANN index went stale if the collection was rewritten, and search would ignore it
+    stale_ann = os.path.exists(ann_path(index_file)) and load_ann_index(index_file) is None
+    if (build_ann or stale_ann) and face_count:
+        ann = build_collection_ann_index(index_file)
+        print(f"ANN index with {ann.n_lists} lists saved to '{ann_path(index_file)}'.")
+
+    print(f"\n✅ Done! {face_count} face(s) saved to '{index_file}'.")
+    if raw_stats is not None and (raw_stats.cached or any(raw_stats.counts.values())):
+        print(raw_stats.summary())
+    if detection == "adaptive":
+        print("Detection passes: " + ", ".join(f"{name}={count}" for name, count in detection_stats.items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the faces of every image in a folder.")
+    parser.add_argument("folder", help="folder to scan for images")
+    parser.add_argument("--output", default=None, help="collection file to write, .facedb or legacy .pkl (default: faces_indexed/<N>-faces-<timestamp>.facedb)")
+    parser.add_argument("--incremental", action="store_true", help="update --output in place, skipping unchanged images")
+    parser.add_argument("--ann", action="store_true", help="also build an approximate nearest-neighbour index for search")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument("--max-faces", type=int, default=4, help="maximum faces kept per image (default: 4)")
+    parser.add_argument("--detection", choices=["full", "adaptive"], default="full", help="face detection mode (default: full)")
+    parser.add_argument("--prefetch", type=int, default=2, help="decoded images buffered ahead of detection, 0 disables the pipeline (default: 2)")
+    parser.add_argument("--detect-queue", type=int, default=2, help="detected images buffered ahead of encoding (default: 2)")
+    parser.add_argument("--raw", choices=["full", "half", "preview"], default=None, help="also index RAW files, decoded in memory in this mode")
+    parser.add_argument("--thumbnails", action="store_true", help="store face and image thumbnails with the collection for search previews")
+    args = parser.parse_args()
 
-    # Save the index
-    with open(index_file, "wb") as f:
-        pickle.dump(encoded_faces, f)
+    image_paths = collect_image_paths(args.folder, IMG_EXTENSIONS)
+    if args.raw:
+        from functools import partial
+        from raw_converter import load_raw_image
+        raw_loader = partial(load_raw_image, mode=args.raw)
+        image_paths += [(path, raw_loader) for path in collect_image_paths(args.folder, RAW_EXTENSIONS)]
 
-    print(f"\n✅ Done! {len(encoded_faces)} face(s) saved to '{index_file}'.")
\ No newline at end of file
+    index_faces(image_paths,
+                index_file=args.output,
+                max_faces_per_image=args.max_faces,
+                workers=args.workers,
+                prefetch=args.prefetch,
+                detect_queue=args.detect_queue,
+                detection=args.detection,
+                incremental=args.incremental,
+                build_ann=args.ann,
+                thumbnails=args.thumbnails,
+                source_root=args.folder)
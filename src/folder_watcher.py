@@ -0,0 +1,261 @@
+import argparse
+import bisect
+import ctypes
+import ctypes.util
+import errno
+import functools
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from face_collection import load_manifest, needs_indexing, update_manifest_entries
+from face_indexer import index_faces
+from utils.file_utils import is_raw_path, scan_image_files, IMG_EXTENSIONS, RAW_EXTENSIONS
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+class InotifyWatcher:
+    """Reports changed paths under a root through Linux inotify, loaded with ctypes.
+
+    Every directory of the tree is watched; directories created later are
+    added as they appear. poll() returns the paths of files written, moved or
+    deleted, and of directories created, moved or deleted (the caller expands
+    those). When the kernel queue overflows the root itself is reported.
+    """
+
+    def __init__(self, root, extensions):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.root = root
+        self.extensions = {ext.lower() for ext in extensions}
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}  # watch descriptor -> directory path
+        self._watch_tree(root)
+
+    def _watch_tree(self, directory):
+        """Watch a directory and its subdirectories; returns the directories added."""
+        added = []
+        stack = [directory]
+        while stack:
+            path = stack.pop()
+            wd = self._add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    # Out of watches: let the caller fall back to polling
+                    raise OSError(err, "inotify watch limit reached")
+                continue
+            self._dirs[wd] = path
+            added.append(path)
+            try:
+                with os.scandir(path) as it:
+                    stack.extend(entry.path for entry in it if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+        return added
+
+    def _matches(self, name):
+        return os.path.splitext(name)[1].lower() in self.extensions
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds and return the set of changed paths."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changed.add(self.root)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                self._dirs.pop(wd, None)
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    changed.add(directory)
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                # Files may already be in a new directory by the time it is watched
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                changed.add(path)
+            elif self._matches(name) and mask & (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """Reports changed paths by comparing stat snapshots of the tree taken every interval seconds."""
+
+    def __init__(self, root, extensions, interval=5.0):
+        self.root = root
+        self.extensions = list(extensions)
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self):
+        return {scanned.path: (scanned.stat.st_mtime_ns, scanned.stat.st_size)
+                for scanned in scan_image_files(self.root, self.extensions)}
+
+    def poll(self, timeout):
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, wait))
+        snapshot = self._scan()
+        self._next_scan = time.monotonic() + self.interval
+        changed = {path for path, signature in snapshot.items() if self._snapshot.get(path) != signature}
+        changed.update(path for path in self._snapshot if path not in snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+def create_watcher(root, extensions, use_inotify=True, poll_interval=5.0):
+    """Return an InotifyWatcher where the platform supports it, else a PollingWatcher."""
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, extensions)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), falling back to polling every {poll_interval:.0f}s")
+    return PollingWatcher(root, extensions, poll_interval)
+
+def plan_changes(changed, manifest, extensions, refreshed=None):
+    """Split changed paths into (images to index, images to remove from the collection).
+
+    Existing directories are rescanned. Manifest images inside a changed
+    path that no longer exist are removed, so deleting a file or a whole
+    directory drops its faces. Images whose size, mtime or hash still match
+    the manifest are not indexed again (see needs_indexing for refreshed).
+    """
+    indexed_paths = sorted(manifest)
+    to_index, removed = set(), set()
+    for path in changed:
+        if os.path.isdir(path):
+            to_index.update(scanned.path for scanned in scan_image_files(path, extensions))
+        elif os.path.exists(path):
+            to_index.add(path)
+        # The manifest images inside path form one range of the sorted paths
+        prefix = path.rstrip(os.sep) + os.sep
+        inside = indexed_paths[bisect.bisect_left(indexed_paths, prefix):bisect.bisect_left(indexed_paths, prefix + "\uffff")]
+        if path in manifest:
+            inside.append(path)
+        removed.update(p for p in inside if p not in to_index and not os.path.exists(p))
+    return sorted(p for p in to_index if needs_indexing(p, manifest, refreshed)), sorted(removed)
+
+def watch_folder(root, collection_path, extensions=None, raw_mode=None, debounce=2.0, max_delay=30.0,
+                 use_inotify=True, poll_interval=5.0, initial_sync=True, stop_event=None, on_batch=None,
+                 **index_kwargs):
+    """Keep a collection in sync with a folder until stop_event is set.
+
+    Changes are accumulated until no new one has arrived for debounce
+    seconds (or max_delay seconds passed since the first one), then applied
+    as one incremental update: new and modified images are indexed, deleted
+    ones removed. With initial_sync the whole folder is reconciled first.
+    RAW files are included, decoded in memory, when raw_mode is given.
+    on_batch(indexed_paths, removed_paths) is called after every update and
+    index_kwargs are passed on to index_faces.
+    """
+    if extensions is None:
+        extensions = IMG_EXTENSIONS + (RAW_EXTENSIONS if raw_mode else [])
+    stop_event = stop_event or threading.Event()
+    raw_loader = None
+    if raw_mode:
+        from raw_converter import load_raw_image
+        raw_loader = functools.partial(load_raw_image, mode=raw_mode)
+
+    def apply(changed):
+        manifest = load_manifest(collection_path)
+        # Only images under the watched root can be removed
+        under_root = {p: e for p, e in manifest.items() if p.startswith(root.rstrip(os.sep) + os.sep)}
+        refreshed = {}
+        to_index, removed = plan_changes(changed, under_root, extensions, refreshed)
+        if refreshed:
+            update_manifest_entries(collection_path, refreshed)
+        if not to_index and not removed:
+            return
+        items = [(p, raw_loader) if raw_loader and is_raw_path(p) else p for p in to_index]
+        index_faces(items, index_file=collection_path, incremental=True, removed_paths=removed,
+                    source_root=root, **index_kwargs)
+        if on_batch:
+            on_batch(to_index, removed)
+
+    watcher = create_watcher(root, extensions, use_inotify, poll_interval)
+    try:
+        if initial_sync:
+            apply({root})
+        print(f"👀 Watching '{root}' ({type(watcher).__name__}), press Ctrl+C to stop.")
+        pending = set()
+        first_change = last_change = None
+        while not stop_event.is_set():
+            changed = watcher.poll(0.5)
+            now = time.monotonic()
+            if changed:
+                pending |= changed
+                last_change = now
+                first_change = first_change or now
+            if pending and (now - last_change >= debounce or now - first_change >= max_delay):
+                batch, pending = pending, set()
+                first_change = last_change = None
+                apply(batch)
+    finally:
+        watcher.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a folder and keep a face collection up to date.")
+    parser.add_argument("folder", help="folder to watch")
+    parser.add_argument("collection", help="collection file to update, .facedb or legacy .pkl")
+    parser.add_argument("--raw", choices=["full", "half", "preview"], default=None, help="also index RAW files, decoded in memory in this mode")
+    parser.add_argument("--debounce", type=float, default=2.0, help="seconds without changes before an update (default: 2)")
+    parser.add_argument("--poll", action="store_true", help="poll with stat snapshots instead of using inotify")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="seconds between snapshots when polling (default: 5)")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument("--detection", choices=["full", "adaptive"], default="full", help="face detection mode (default: full)")
+    args = parser.parse_args()
+
+    try:
+        watch_folder(args.folder, args.collection, raw_mode=args.raw, debounce=args.debounce,
+                     use_inotify=not args.poll, poll_interval=args.poll_interval,
+                     workers=args.workers, detection=args.detection)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
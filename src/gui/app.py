@@ -5,6 +5,7 @@ Handles navigation between different pages/views
 
 import tkinter as tk
 from tkinter import ttk
+from .pages.collections_page import CollectionsPage
 from .pages.home_page import HomePage
 from .pages.index_page import IndexPage
 from .pages.search_page import SearchPage
@@ -38,6 +39,7 @@ class FaceIndexerApp:
         self.pages["home"] = HomePage(self.main_frame, self)
         self.pages["index"] = IndexPage(self.main_frame, self)
         self.pages["search"] = SearchPage(self.main_frame, self)
+        self.pages["collections"] = CollectionsPage(self.main_frame, self)
     
     def show_page(self, page_name):
         """Show the specified page and hide others."""
@@ -62,4 +64,8 @@ class FaceIndexerApp:
     
     def navigate_to_search(self):
         """Navigate to search page."""
-        self.show_page("search")
\ No newline at end of file
+        self.show_page("search")
+    
+    def navigate_to_collections(self):
+        """Navigate to collections page."""
+        self.show_page("collections")
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Collection browser listing the face collections in faces_indexed/
+"""
+
+import os
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+from face_collection import list_collections, write_collection_info
+from ..base_page import BasePage
+
+class CollectionsPage(BasePage):
+    """Lists every collection from its info sidecar, without loading any of them."""
+
+    COLUMNS = (("faces", "Faces", 80), ("images", "Images", 80), ("format", "Format", 80),
+               ("roots", "Source folders", 260), ("detector", "Detector", 120),
+               ("created", "Created", 140), ("updated", "Updated", 140))
+
+    def _setup_ui(self):
+        # Navigation bar
+        self._create_navigation_bar()
+
+        # Main container
+        self.content_frame = ttk.Frame(self.frame, padding=20)
+        self.content_frame.pack(fill="both", expand=True)
+
+        ttk.Label(self.content_frame,
+                  text="Face Collections",
+                  font=('Arial', 18, 'bold')).pack(pady=(0, 10))
+
+        self.directory = os.path.join(os.getcwd(), "faces_indexed")
+        controls_frame = ttk.Frame(self.content_frame)
+        controls_frame.pack(fill="x", pady=(0, 10))
+        ttk.Label(controls_frame, text=self.directory).pack(side="left")
+        ttk.Button(controls_frame, text="Search Selected", command=self.search_selected).pack(side="right", padx=5)
+        self.build_btn = ttk.Button(controls_frame, text="Build Missing Info", command=self.build_missing_info)
+        self.build_btn.pack(side="right", padx=5)
+        ttk.Button(controls_frame, text="Refresh", command=self.refresh).pack(side="right", padx=5)
+
+        tree_frame = ttk.Frame(self.content_frame)
+        tree_frame.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(tree_frame, columns=[name for name, _, _ in self.COLUMNS], selectmode="extended")
+        self.tree.heading("#0", text="Collection")
+        self.tree.column("#0", width=260)
+        for name, title, width in self.COLUMNS:
+            self.tree.heading(name, text=title)
+            self.tree.column(name, width=width, anchor="w")
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.bind("<Double-1>", lambda e: self.search_selected())
+
+        self.status_label = ttk.Label(self.content_frame, text="", font=('Arial', 9))
+        self.status_label.pack(anchor="w", pady=(5, 0))
+
+        self._missing = []  # Collections without an info sidecar (legacy .pkl files)
+
+    def show(self):
+        super().show()
+        self.refresh()
+
+    def refresh(self):
+        """Lists the collections again, reading only their info sidecars."""
+        self.tree.delete(*self.tree.get_children())
+        self._missing = []
+        for path, info in list_collections(self.directory):
+            if info is None:
+                self._missing.append(path)
+                values = ["?"] * 2 + [os.path.splitext(path)[1].lstrip(".")] + [""] * 4
+            else:
+                detector = info.get("detector") or {}
+                values = [info["faces"], "?" if info.get("images") is None else info["images"],
+                          f"{info['format']} v{info['format_version']}" if info.get("format_version") else info["format"],
+                          ", ".join(info.get("source_roots", [])), detector.get("detection", ""),
+                          info.get("created", "").replace("T", " "), info.get("updated", "").replace("T", " ")]
+            self.tree.insert("", "end", iid=path, text=os.path.basename(path), values=values)
+        count = len(self.tree.get_children())
+        status = f"{count} collection(s)"
+        if self._missing:
+            status += f", {len(self._missing)} without info (use Build Missing Info)"
+        self.status_label.config(text=status)
+        self.build_btn.config(state="normal" if self._missing else "disabled")
+
+    def build_missing_info(self):
+        """Loads each collection without a sidecar once, in the background, to write it."""
+        missing = list(self._missing)
+        self.build_btn.config(state="disabled")
+        self.status_label.config(text=f"Building info for {len(missing)} collection(s)...")
+
+        def task():
+            for path in missing:
+                try:
+                    write_collection_info(path)
+                except Exception as e:
+                    error_msg = f"Error reading {path}: {e}"
+                    self.app.root.after(0, lambda: print(error_msg))
+            self.app.root.after(0, self.refresh)
+
+        threading.Thread(target=task, daemon=True).start()
+
+    def search_selected(self):
+        """Opens the Search page with the selected collections, searched together."""
+        selection = self.tree.selection()
+        if selection:
+            self.app.pages["search"].use_collections(list(selection))
+            self.app.navigate_to_search()
@@ -51,6 +51,14 @@ class HomePage(BasePage):
                                   width=20)
         search_button.pack(pady=10)
         
+        # Collections button
+        collections_button = ttk.Button(button_frame,
+                                       text="Collections",
+                                       command=self.app.navigate_to_collections,
+                                       style="HomeButton.TButton",
+                                       width=20)
+        collections_button.pack(pady=10)
+        
         # Add some descriptive text
         description_frame = ttk.Frame(content_frame, style="Home.TFrame")
         description_frame.pack(pady=(30, 0))
@@ -63,4 +71,9 @@ class HomePage(BasePage):
         search_desc = ttk.Label(description_frame,
                                text="• Search Faces: Find photos containing specific people",
                                style="HomeSubtitle.TLabel")
-        search_desc.pack(anchor="w", pady=2)
\ No newline at end of file
+        search_desc.pack(anchor="w", pady=2)
+        
+        collections_desc = ttk.Label(description_frame,
+                                    text="• Collections: Browse the face databases in faces_indexed",
+                                    style="HomeSubtitle.TLabel")
+        collections_desc.pack(anchor="w", pady=2)
\ No newline at end of file
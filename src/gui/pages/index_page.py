@@ -2,26 +2,29 @@
 Face indexing page - main functionality from original app
 """
 
+import functools
 import os
 import threading
 import tkinter as tk
 from tkinter import filedialog, ttk
 from PIL import Image, ImageTk
-from PIL import ImageOps
 import time
 from ..base_page import BasePage
+from ..thumbnail_grid import ThumbnailGrid
+from ..update_channel import UpdateChannel
 # Import your existing modules - adjust paths as needed
 from face_indexer import index_faces
-from raw_converter import convert_all_raw_images
-from utils.file_utils import collect_image_paths
-
-# Define common RAW and standard image extensions
-RAW_EXTENSIONS = ['.nef', '.arw', '.dng', '.cr2', '.cr3']
-IMG_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp']
+from folder_watcher import watch_folder
+from raw_cache import RawCache
+from raw_converter import ConversionStats, load_raw_image, RAW_MODES
+from thumbnail_service import thumbnail_service
+from utils.file_utils import is_raw_path, scan_image_files, IMG_EXTENSIONS, RAW_EXTENSIONS
 
 class IndexPage(BasePage):
     """Face indexing page with all the original functionality."""
     
+    UI_REFRESH_RATE = 10  # Maximum UI refreshes per second while indexing
+    
     def _setup_ui(self):
         """Setup the indexing page UI."""
         # Navigation bar
@@ -55,13 +58,31 @@ class IndexPage(BasePage):
         self.use_raw_var = tk.BooleanVar(value=True)
         self.show_preview_var = tk.BooleanVar(value=True)
         self.show_indexed_faces_var = tk.BooleanVar(value=True)
+        self.workers_var = tk.IntVar(value=1)
+        self.fast_detection_var = tk.BooleanVar(value=False)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self._scan_id = 0  # Incremented for every folder scan, stale scans stop on mismatch
+        self.raw_mode_var = tk.StringVar(value="full")
+        self.raw_cache_var = tk.BooleanVar(value=True)
+        self.store_thumbnails_var = tk.BooleanVar(value=True)
+        self.watch_var = tk.BooleanVar(value=False)
+        self._watch_stop = None
+        
+        # Decoded RAW files are kept on disk between runs, up to the cache's disk budget
+        self.raw_cache = RawCache()
+        self.raw_cache_text = ""
         
         # Sets to keep track of selected image paths and image references
         self.selected_images = set()
-        self.image_thumbnails = {}
-        self.thumbnail_items = {}
+        self._selection_anchor = None  # Last clicked path, start of Shift+click ranges
+        self._image_mtimes = {}  # path -> modification time read while scanning
+        self.selection_filter_var = tk.StringVar(value="Folder")
+        self.selection_filter_value = tk.StringVar()
         self.indexed_faces_data = []
         self.indexed_face_images = []
+        # One thumbnail per original image, shared by all of its faces
+        self._original_thumbnails = {}  # path -> PhotoImage
+        self._original_labels = {}  # path -> labels waiting for its thumbnail
         
         # Timing and statistics
         self.start_time = None
@@ -84,6 +105,26 @@ class IndexPage(BasePage):
         ttk.Checkbutton(control_frame, text="Include RAW Files", variable=self.use_raw_var, command=self.scan_folder_for_images).grid(row=1, column=0, sticky="w", pady=5)
         ttk.Checkbutton(control_frame, text="Show Photo Section", variable=self.show_preview_var, command=self.toggle_photo_section).grid(row=1, column=1, sticky="w", pady=5)
         
+        ttk.Checkbutton(control_frame, text="Fast Detection (downscaled first pass)", variable=self.fast_detection_var).grid(row=3, column=0, columnspan=2, sticky="w", pady=(0, 2))
+        
+        ttk.Checkbutton(control_frame, text="Update Existing Collection", variable=self.incremental_var).grid(row=3, column=2, sticky="w", pady=(0, 2))
+        
+        ttk.Checkbutton(control_frame, text="Cache RAW Decodes", variable=self.raw_cache_var).grid(row=4, column=0, sticky="w", pady=(0, 2))
+        
+        ttk.Checkbutton(control_frame, text="Store Thumbnails (fast search previews)", variable=self.store_thumbnails_var).grid(row=4, column=1, sticky="w", pady=(0, 2))
+        
+        ttk.Checkbutton(control_frame, text="Watch Folder (keep a collection updated)", variable=self.watch_var, command=self.toggle_watch).grid(row=4, column=2, sticky="w", pady=(0, 2))
+        
+        # Number of worker processes used for indexing
+        workers_frame = ttk.Frame(control_frame)
+        workers_frame.grid(row=2, column=2, sticky="e", pady=(0, 2))
+        ttk.Label(workers_frame, text="Workers:").pack(side="left", padx=(0, 5))
+        ttk.Spinbox(workers_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.workers_var, width=4).pack(side="left")
+        
+        # How RAW files are decoded: full, half size or embedded camera preview
+        ttk.Label(workers_frame, text="RAW:").pack(side="left", padx=(10, 5))
+        ttk.Combobox(workers_frame, textvariable=self.raw_mode_var, values=RAW_MODES, state="readonly", width=8).pack(side="left")
+        
         # Selected images counter label
         self.selected_count_label = ttk.Label(control_frame, text="0 images selected", font=('Arial', 9))
         self.selected_count_label.grid(row=2, column=0, columnspan=2, sticky="w", pady=(0, 2))
@@ -96,30 +137,29 @@ class IndexPage(BasePage):
         """Setup image preview section."""
         self.preview_frame = ttk.LabelFrame(parent, text="Image Previews (Click to Select/Deselect)", padding=(10,5))
         self.preview_frame.grid(row=1, column=0, columnspan=2, sticky="nsew", pady=(5,5))
-        self.preview_frame.grid_rowconfigure(0, weight=1)
+        self.preview_frame.grid_rowconfigure(1, weight=1)
         self.preview_frame.grid_columnconfigure(0, weight=1)
         
-        # Canvas with Scrollbar for the main image thumbnails
-        self.canvas_scroll_frame = ttk.Frame(self.preview_frame)
-        self.canvas_scroll_frame.grid(row=0, column=0, sticky="nsew")
-        self.canvas_scroll_frame.grid_rowconfigure(0, weight=1)
-        self.canvas_scroll_frame.grid_columnconfigure(0, weight=1)
-        
-        self.canvas = tk.Canvas(self.canvas_scroll_frame, bg="#e0e0e0", highlightbackground="#cccccc", highlightthickness=1)
-        self.canvas.grid(row=0, column=0, sticky="nsew")
-        
-        # Vertical scrollbar for the canvas
-        self.scrollbar_y = ttk.Scrollbar(self.canvas_scroll_frame, orient="vertical", command=self.canvas.yview)
-        self.scrollbar_y.grid(row=0, column=1, sticky="ns")
-        self.canvas.config(yscrollcommand=self.scrollbar_y.set)
-        
-        # Bind canvas configure event to update scroll region
-        self.canvas.bind('<Configure>', self._on_canvas_configure)
-        
-        # Inner frame to hold image thumbnails, placed inside the canvas
-        self.inner_canvas_frame = ttk.Frame(self.canvas)
-        self.canvas_window_id = self.canvas.create_window((0, 0), window=self.inner_canvas_frame, anchor="nw")
-        self.inner_canvas_frame.bind("<Configure>", self._on_inner_frame_configure)
+        # Bulk selection: only the visible cells are restyled, whatever the number of images
+        selection_frame = ttk.Frame(self.preview_frame)
+        selection_frame.grid(row=0, column=0, sticky="ew", pady=(0, 5))
+        ttk.Button(selection_frame, text="All", width=6, command=self.select_all).pack(side="left", padx=(0, 2))
+        ttk.Button(selection_frame, text="None", width=6, command=self.select_none).pack(side="left", padx=2)
+        ttk.Button(selection_frame, text="Invert", width=6, command=self.invert_selection).pack(side="left", padx=2)
+        ttk.Label(selection_frame, text="Select only:").pack(side="left", padx=(15, 5))
+        ttk.Combobox(selection_frame, textvariable=self.selection_filter_var, values=("Folder", "Extension", "Date"),
+                     state="readonly", width=10).pack(side="left")
+        filter_entry = ttk.Entry(selection_frame, textvariable=self.selection_filter_value, width=30)
+        filter_entry.pack(side="left", padx=5)
+        filter_entry.bind("<Return>", lambda e: self.select_matching_filter())
+        ttk.Button(selection_frame, text="Apply", command=self.select_matching_filter).pack(side="left")
+        ttk.Label(selection_frame, text="Shift+click selects a range", font=('Arial', 8),
+                  foreground="#666666").pack(side="right")
+        
+        # Virtualized grid: widgets only exist for the visible rows, thumbnails load in the background
+        self.thumbnail_grid = ThumbnailGrid(self.preview_frame, on_click=self.toggle_selection,
+                                            is_selected=lambda path: path in self.selected_images)
+        self.thumbnail_grid.frame.grid(row=1, column=0, sticky="nsew")
     
     def _setup_progress_section(self, parent):
         """Setup progress bar and timing info."""
@@ -183,15 +223,6 @@ class IndexPage(BasePage):
         self.indexed_inner_frame.bind("<Configure>", self._on_indexed_inner_frame_configure)
     
     # Canvas event handlers
-    def _on_canvas_configure(self, event):
-        """Updates the canvas scroll region when the canvas itself is resized."""
-        self.canvas.itemconfig(self.canvas_window_id, width=event.width)
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
-    
-    def _on_inner_frame_configure(self, event):
-        """Updates the canvas scroll region when the content (inner frame) changes size."""
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
-    
     def _on_indexed_canvas_configure(self, event):
         """Updates the indexed faces canvas scroll region when resized."""
         self.indexed_canvas.itemconfig(self.indexed_canvas_window_id, width=event.width)
@@ -210,7 +241,13 @@ class IndexPage(BasePage):
             self.scan_folder_for_images()
     
     def scan_folder_for_images(self):
-        """Scans the currently set folder path for images based on selected extensions."""
+        """Scans the currently set folder path for images based on selected extensions.
+        
+        The scan runs in a background thread and thumbnails are added as
+        batches of files are found, so large folders do not freeze the UI.
+        """
+        # Any scan still running for a previous folder stops feeding the page
+        self._scan_id += 1
         folder = self.folder_path.get()
         if not folder or not os.path.isdir(folder):
             print(f"Error: Folder '{folder}' does not exist or is inaccessible.")
@@ -221,20 +258,41 @@ class IndexPage(BasePage):
         if self.use_raw_var.get():
             all_extensions.extend(RAW_EXTENSIONS)
         
-        img_paths = collect_image_paths(folder, all_extensions)
-        
-        print(f"Found {len(img_paths)} image(s) in '{folder}' with extensions: {', '.join(all_extensions)}")
-        self.display_previews(img_paths)
+        self.display_previews([])
+        threading.Thread(target=self._scan_task, args=(folder, all_extensions, self._scan_id), daemon=True).start()
+    
+    def _scan_task(self, folder, extensions, scan_id):
+        """Scans a folder and hands the images found to the Tk thread in batches."""
+        batch = []
+        found = 0
+        last_flush = time.time()
+        for scanned in scan_image_files(folder, extensions):
+            if scan_id != self._scan_id:
+                return
+            batch.append(scanned)
+            found += 1
+            if len(batch) >= 100 or time.time() - last_flush >= 0.2:
+                self.app.root.after(0, lambda scanned_files=batch: self._append_scanned(scanned_files, scan_id))
+                batch = []
+                last_flush = time.time()
+        self.app.root.after(0, lambda: self._append_scanned(batch, scan_id))
+        print(f"Found {found} image(s) in '{folder}' with extensions: {', '.join(extensions)}")
+    
+    def _append_scanned(self, scanned_files, scan_id):
+        """Adds a batch of scanned files, keeping their modification times for the date filter."""
+        if scan_id != self._scan_id:
+            return
+        self._image_mtimes.update((scanned.path, scanned.stat.st_mtime) for scanned in scanned_files)
+        self.append_previews([scanned.path for scanned in scanned_files], scan_id)
     
     # Preview handling methods
     def clear_previews(self):
         """Clears all displayed thumbnails and resets selection."""
-        for widget in self.inner_canvas_frame.winfo_children():
-            widget.destroy()
-        self.image_thumbnails.clear()
-        self.thumbnail_items.clear()
+        self.thumbnail_grid.clear()
         self.selected_images = set()
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
+        self._selection_anchor = None
+        self._image_mtimes = {}
+        self._update_selected_count()
     
     def display_previews(self, img_paths):
         """Clears existing thumbnails and displays new ones for the given image paths."""
@@ -243,73 +301,102 @@ class IndexPage(BasePage):
         # Ensure the photo section is visible when new images are displayed
         self.show_preview_var.set(True)
         self.toggle_photo_section()
-            
-        col_count = 6
-        thumbnail_size = 80
-        padding_x = 10
-        padding_y = 15
-        current_row = 0
-        current_col = 0
-        
-        for path in img_paths:
-            try:
-                image = Image.open(path)
-                image = ImageOps.exif_transpose(image)
-                image.thumbnail((thumbnail_size, thumbnail_size))
-                
-                img_tk = ImageTk.PhotoImage(image)
-                self.image_thumbnails[path] = img_tk
-                
-                thumb_container = ttk.Frame(self.inner_canvas_frame, relief="solid", borderwidth=1, style="Thumbnail.TFrame")
-                
-                img_label = ttk.Label(thumb_container, image=img_tk, cursor="hand2")
-                img_label.pack(pady=5, padx=5)
-                
-                file_name_label = ttk.Label(thumb_container, text=os.path.basename(path), wraplength=thumbnail_size + 20, anchor="center")
-                file_name_label.pack(pady=2)
-                
-                thumb_container.grid(row=current_row, column=current_col, padx=padding_x, pady=padding_y, sticky="nsew")
-                
-                self.thumbnail_items[path] = thumb_container
-                
-                thumb_container.bind('<Button-1>', lambda e, p=path: self.toggle_selection(p))
-                img_label.bind('<Button-1>', lambda e, p=path: self.toggle_selection(p))
-                
-                current_col += 1
-                if current_col >= col_count:
-                    current_col = 0
-                    current_row += 1
-                
-                self.selected_images.add(path)
-                
-            except Exception as e:
-                print(f"Error loading {path}: {e}")
         
-        self.app.root.update_idletasks()
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
-        self.canvas.itemconfig(self.canvas_window_id, width=self.canvas.winfo_width())
+        self.append_previews(img_paths)
+    
+    def append_previews(self, img_paths, scan_id=None):
+        """Adds thumbnails after the ones already shown; new images start selected.
+        
+        Batches from a scan that has since been replaced (scan_id no longer
+        current) are ignored. Only visible cells get widgets, and their
+        thumbnails are decoded off the Tk thread.
+        """
+        if scan_id is not None and scan_id != self._scan_id:
+            return
+        if not img_paths:
+            return
         
+        self.selected_images.update(img_paths)
+        self.thumbnail_grid.extend(img_paths)
+        self._update_selected_count()
+    
+    def toggle_selection(self, path, shift=False):
+        """Adds or removes an image path from the selected_images set.
+        
+        With shift, every image between the previously clicked one and path
+        gets path's new state instead.
+        """
+        select = path not in self.selected_images
+        start = self.thumbnail_grid.index(self._selection_anchor) if shift and self._selection_anchor else None
+        if start is None:
+            changed = {path}
+        else:
+            end = self.thumbnail_grid.index(path)
+            changed = set(self.thumbnail_grid.paths[min(start, end):max(start, end) + 1])
+        if select:
+            self.selected_images |= changed
+        else:
+            self.selected_images -= changed
+        self._selection_anchor = path
+        self.thumbnail_grid.restyle(changed)
+        self._update_selected_count()
+    
+    def select_all(self):
+        self.selected_images = set(self.thumbnail_grid.paths)
+        self.update_thumbnail_borders()
+    
+    def select_none(self):
+        self.selected_images = set()
+        self.update_thumbnail_borders()
+    
+    def invert_selection(self):
+        self.selected_images = set(self.thumbnail_grid.paths) - self.selected_images
         self.update_thumbnail_borders()
     
-    def toggle_selection(self, path):
-        """Adds or removes an image path from the selected_images set."""
-        if path in self.selected_images:
-            self.selected_images.remove(path)
+    def select_matching_filter(self):
+        """Selects only the images matching the filter entered above the previews.
+        
+        Folder matches images inside a subfolder (relative to the current
+        folder), Extension a comma-separated list of extensions and Date a
+        modification date (YYYY-MM-DD) or range (YYYY-MM-DD..YYYY-MM-DD).
+        """
+        value = self.selection_filter_value.get().strip()
+        kind = self.selection_filter_var.get()
+        if kind == "Folder":
+            folder = os.path.normpath(os.path.join(self.folder_path.get(), value))
+            prefix = folder.rstrip(os.sep) + os.sep
+            matches = lambda path: path.startswith(prefix)
+        elif kind == "Extension":
+            extensions = {"." + ext.strip().lower().lstrip(".") for ext in value.split(",") if ext.strip()}
+            matches = lambda path: os.path.splitext(path)[1].lower() in extensions
         else:
-            self.selected_images.add(path)
+            first, _, last = value.partition("..")
+            try:
+                start = time.mktime(time.strptime(first.strip(), "%Y-%m-%d"))
+                end = time.mktime(time.strptime((last or first).strip(), "%Y-%m-%d")) + 24 * 3600
+            except ValueError:
+                print(f"Invalid date filter '{value}', expected YYYY-MM-DD or YYYY-MM-DD..YYYY-MM-DD")
+                return
+            matches = lambda path: start <= self._get_mtime(path) < end
+        self.selected_images = {path for path in self.thumbnail_grid.paths if matches(path)}
         self.update_thumbnail_borders()
     
+    def _get_mtime(self, path):
+        mtime = self._image_mtimes.get(path)
+        if mtime is None:
+            try:
+                mtime = self._image_mtimes[path] = os.path.getmtime(path)
+            except OSError:
+                mtime = self._image_mtimes[path] = 0.0
+        return mtime
+    
     def update_thumbnail_borders(self):
-        """Updates the visual border style of thumbnails based on their selection state."""
-        for path, frame_widget in self.thumbnail_items.items():
-            if path in self.selected_images:
-                frame_widget.config(borderwidth=3, relief="solid")
-                frame_widget.configure(style="Selected.TFrame")
-            else:
-                frame_widget.config(borderwidth=1, relief="solid")
-                frame_widget.configure(style="Thumbnail.TFrame")
-    
-        # Update the selected count label
+        """Updates the visual border style of the visible thumbnails based on their selection state."""
+        self.thumbnail_grid.restyle()
+        self._update_selected_count()
+    
+    def _update_selected_count(self):
+        """Updates the selected count label."""
         count = len(self.selected_images)
         self.selected_count_label.config(text=f"{count} image{'s' if count != 1 else ''} selected")
     
@@ -317,6 +404,13 @@ class IndexPage(BasePage):
         """Returns a list of currently selected image paths."""
         return list(self.selected_images)
     
+    def _get_workers(self):
+        """Returns the number of indexing worker processes, falling back to 1 on invalid input."""
+        try:
+            return max(1, int(self.workers_var.get()))
+        except (tk.TclError, ValueError):
+            return 1
+    
     # Face indexing methods
     def run_index_thread(self):
         """Starts the face indexing process in a separate thread."""
@@ -325,6 +419,17 @@ class IndexPage(BasePage):
             print("No images selected for indexing.")
             return
         
+        # Incremental runs update a chosen collection in place and skip unchanged images
+        index_file = None
+        if self.incremental_var.get():
+            index_file = filedialog.asksaveasfilename(title="Select collection to update",
+                                                      initialdir=os.path.join(os.getcwd(), "faces_indexed"),
+                                                      defaultextension=".facedb",
+                                                      filetypes=[("Face collections", "*.facedb *.pkl")],
+                                                      confirmoverwrite=False)
+            if not index_file:
+                return
+        
         # Clear previous indexed faces data
         self.clear_indexed_faces()
         
@@ -336,9 +441,9 @@ class IndexPage(BasePage):
         self.index_btn.config(state="disabled")
         self.progress["value"] = 0
         
-        threading.Thread(target=self.index_faces_task, args=(image_paths,), daemon=True).start()
+        threading.Thread(target=self.index_faces_task, args=(image_paths, index_file), daemon=True).start()
     
-    def index_faces_task(self, image_paths):
+    def index_faces_task(self, image_paths, index_file=None):
         """The main task for indexing faces, potentially including RAW conversion."""
         total = len(image_paths)
         if not total:
@@ -349,32 +454,47 @@ class IndexPage(BasePage):
         self.app.root.after(0, lambda: self.update_progress(0, total))
         self.app.root.after(0, lambda: self.update_timing_display(0, total))
         
+        # Progress and face previews reach the UI in batches, a few times per second
+        updates = UpdateChannel(self.app.root, self.apply_indexing_updates, max_rate=self.UI_REFRESH_RATE)
+        
         def on_progress(current, total):
             """Callback for updating progress from the index_faces function."""
             self.images_processed = current
             elapsed = time.time() - self.start_time
             self.processing_times.append(elapsed / current if current > 0 else 0)
-            self.app.root.after(0, lambda: self.update_progress(current, total))
-            self.app.root.after(0, lambda: self.update_timing_display(current, total))
+            updates.update(progress=(current, total))
         
         def preview_callback(face_img_np, original_img_path, face_name):
             """Callback for displaying individual face previews from index_faces."""
             self.total_faces_found += 1
-            self.app.root.after(0, lambda: self.add_indexed_face(face_img_np, original_img_path, face_name))
+            updates.post((face_img_np, original_img_path, face_name))
         
         try:
+            # RAW files are decoded in memory by the indexer itself, no JPEG is written
             processed_image_paths = image_paths
+            self.raw_cache_text = ""
+            cache = None
+            raw_stats = ConversionStats()
             if self.use_raw_var.get():
-                raw_paths_to_convert = [p for p in image_paths if os.path.splitext(p)[1].lower() in RAW_EXTENSIONS]
-                if raw_paths_to_convert:
-                    self.app.root.after(0, lambda: print("Converting RAW images (this may take a moment)..."))
-                    converted_paths = convert_all_raw_images(raw_paths_to_convert)
-                    processed_image_paths = [p for p in image_paths if p not in raw_paths_to_convert] + converted_paths
+                cache = self.raw_cache if self.raw_cache_var.get() else None
+                raw_loader = functools.partial(load_raw_image, mode=self.raw_mode_var.get(), cache=cache)
+                processed_image_paths = [(p, raw_loader) if is_raw_path(p) else p for p in image_paths]
             
             # Call the main face indexing function
-            index_faces(processed_image_paths, progress_callback=on_progress, preview_callback=preview_callback)
+            index_faces(processed_image_paths, index_file=index_file, incremental=index_file is not None,
+                        progress_callback=on_progress, preview_callback=preview_callback,
+                        workers=self._get_workers(),
+                        detection="adaptive" if self.fast_detection_var.get() else "full",
+                        thumbnails=self.store_thumbnails_var.get(),
+                        source_root=self.folder_path.get() or None, raw_stats=raw_stats)
+            if cache is not None:
+                # Counted from the decodes' reports, which also cover workers running in other processes;
+                # RAW files skipped as unchanged never reach the cache
+                misses = sum(raw_stats.counts.values())
+                self.raw_cache_text = f"RAW cache: {raw_stats.cached} hit(s), {misses} miss(es)"
             
             # Update final statistics
+            updates.close()
             self.app.root.after(0, self.update_final_statistics)
             self.app.root.after(0, lambda: print("Indexing complete."))
             
@@ -389,7 +509,65 @@ class IndexPage(BasePage):
         finally:
             self.app.root.after(0, lambda: self.index_btn.config(state="normal"))
     
+    # Watch mode methods
+    def toggle_watch(self):
+        """Starts or stops watching the current folder for new, changed and deleted images."""
+        if not self.watch_var.get():
+            if self._watch_stop is not None:
+                self._watch_stop.set()
+                self._watch_stop = None
+            self.timing_label.config(text="Stopped watching")
+            return
+        
+        folder = self.folder_path.get()
+        index_file = None
+        if folder and os.path.isdir(folder):
+            index_file = filedialog.asksaveasfilename(title="Select collection to keep updated",
+                                                      initialdir=os.path.join(os.getcwd(), "faces_indexed"),
+                                                      defaultextension=".facedb",
+                                                      filetypes=[("Face collections", "*.facedb *.pkl")],
+                                                      confirmoverwrite=False)
+        else:
+            print("Select a folder to watch first.")
+        if not index_file:
+            self.watch_var.set(False)
+            return
+        
+        self._watch_stop = threading.Event()
+        raw_mode = self.raw_mode_var.get() if self.use_raw_var.get() else None
+        threading.Thread(target=self._watch_task, args=(folder, index_file, raw_mode, self._watch_stop), daemon=True).start()
+        self.timing_label.config(text=f"Watching {os.path.basename(folder)}...")
+    
+    def _watch_task(self, folder, index_file, raw_mode, stop_event):
+        """Runs watch_folder until stopped, reporting every update in the timing label."""
+        def on_batch(indexed, removed):
+            text = f"Watching: {len(indexed)} indexed, {len(removed)} removed at {time.strftime('%H:%M:%S')}"
+            self.app.root.after(0, lambda: self.timing_label.config(text=text))
+        
+        try:
+            watch_folder(folder, index_file, raw_mode=raw_mode, stop_event=stop_event, on_batch=on_batch,
+                         workers=self._get_workers(),
+                         detection="adaptive" if self.fast_detection_var.get() else "full",
+                         thumbnails=self.store_thumbnails_var.get())
+        except Exception as e:
+            error_msg = f"Error while watching: {e}"
+            self.app.root.after(0, lambda: print(error_msg))
+            self.app.root.after(0, lambda: self.watch_var.set(False))
+    
     # Progress and statistics methods
+    def apply_indexing_updates(self, faces, state):
+        """Applies one batch of indexing updates posted through the update channel."""
+        if "progress" in state:
+            current, total = state["progress"]
+            self.update_progress(current, total)
+            self.update_timing_display(current, total)
+        if faces:
+            for face_img_np, original_img_path, face_name in faces:
+                self.add_indexed_face(face_img_np, original_img_path, face_name)
+            # One layout pass per batch rather than per face
+            self.app.root.update_idletasks()
+            self.indexed_canvas.config(scrollregion=self.indexed_canvas.bbox("all"))
+    
     def update_progress(self, current, total):
         """Updates the progress bar."""
         self.progress["maximum"] = total
@@ -426,6 +604,8 @@ class IndexPage(BasePage):
                      f"Average time per image: {avg_time_per_image:.2f} seconds\n"
                      f"Average faces per image: {self.total_faces_found / self.images_processed:.1f}" 
                      if self.images_processed > 0 else "0")
+        if self.raw_cache_text:
+            stats_text += f"\n{self.raw_cache_text}"
         
         self.stats_label.config(text=stats_text)
         self.timing_label.config(text=f"Completed in {total_time:.1f}s")
@@ -437,10 +617,12 @@ class IndexPage(BasePage):
             widget.destroy()
         self.indexed_faces_data.clear()
         self.indexed_face_images.clear()
+        self._original_thumbnails.clear()
+        self._original_labels.clear()
         self.indexed_canvas.config(scrollregion=self.indexed_canvas.bbox("all"))
     
     def add_indexed_face(self, face_img_np, original_img_path, face_name):
-        """Adds a new indexed face to the display."""
+        """Adds a new indexed face to the display, the caller updates the scroll region."""
         try:
             # Convert numpy array to PIL Image for face
             if face_img_np is not None and face_img_np.size > 0:
@@ -448,17 +630,9 @@ class IndexPage(BasePage):
                 face_pil.thumbnail((100, 100))
                 face_tk = ImageTk.PhotoImage(face_pil)
             
-            # Load and thumbnail the original image
-            original_pil = Image.open(original_img_path)
-            original_pil = ImageOps.exif_transpose(original_pil)
-            original_pil.thumbnail((150, 150))
-            original_tk = ImageTk.PhotoImage(original_pil)
-            
             # Store references to prevent garbage collection
             if face_img_np is not None and face_img_np.size > 0:
-                self.indexed_face_images.extend([face_tk, original_tk])
-            else:
-                self.indexed_face_images.append(original_tk)
+                self.indexed_face_images.append(face_tk)
             
             # Create container for this face entry
             face_entry = ttk.Frame(self.indexed_inner_frame, padding=10, style="IndexedFace.TFrame")
@@ -478,20 +652,48 @@ class IndexPage(BasePage):
             right_frame = ttk.Frame(face_entry)
             right_frame.pack(side="left")
             
-            original_label = ttk.Label(right_frame, image=original_tk)
+            # The original's thumbnail is rendered in the background and shown once ready
+            original_label = ttk.Label(right_frame, text="Loading...", width=20, anchor="center")
             original_label.pack()
+            self._show_original_thumbnail(original_label, original_img_path)
             
             source_label = ttk.Label(right_frame, text=f"Source: {os.path.basename(original_img_path)}", 
                                    font=('Arial', 8), foreground="#666666")
             source_label.pack(pady=(5, 0))
             
-            # Update scroll region
-            self.app.root.update_idletasks()
-            self.indexed_canvas.config(scrollregion=self.indexed_canvas.bbox("all"))
-            
         except Exception as e:
             print(f"Error adding indexed face: {e}")
     
+    def _show_original_thumbnail(self, label, image_path, size=150):
+        """Shows the thumbnail of an original image in label, rendering it only once per image."""
+        original_tk = self._original_thumbnails.get(image_path)
+        if original_tk is not None:
+            label.config(image=original_tk, text="", width=0)
+            return
+        waiting = self._original_labels.get(image_path)
+        if waiting is not None:
+            waiting.append(label)
+            return
+        self._original_labels[image_path] = [label]
+        
+        def show(future):
+            labels = self._original_labels.pop(image_path, [])
+            try:
+                original_tk = ImageTk.PhotoImage(future.result())
+            except Exception as e:
+                print(f"Error loading {image_path}: {e}")
+                for waiting_label in labels:
+                    if waiting_label.winfo_exists():
+                        waiting_label.config(text="No preview")
+                return
+            self._original_thumbnails[image_path] = original_tk
+            for waiting_label in labels:
+                if waiting_label.winfo_exists():
+                    waiting_label.config(image=original_tk, text="", width=0)
+        
+        future = thumbnail_service.submit(image_path, size)
+        future.add_done_callback(lambda f: self.app.root.after(0, show, f))
+    
     # Section toggle methods
     def toggle_photo_section(self):
         """Hides or shows the main image preview frame based on the checkbox state."""
@@ -1,5 +1,4 @@
 import os
-import pickle
 import threading
 import tkinter as tk
 from tkinter import filedialog, ttk
@@ -7,13 +6,20 @@ from tkinter import messagebox
 from PIL import Image, ImageTk
 import time
 
-from search_matches import search_matches
+from face_collection import read_collection_info, write_collection_info
+from search_matches import (collection_paths_in, search_batch, search_batch_collections, search_collections,
+                            search_image)
+from thumbnail_service import thumbnail_service
+from thumbnail_store import ThumbnailStore
+from utils.file_utils import collect_image_paths, IMG_EXTENSIONS
 
 from ..base_page import BasePage
 
 class SearchPage(BasePage):
     """Search page for finding faces in indexed photos with image previews."""
 
+    PAGE_SIZE = 50  # Matches shown per page of results
+
     def _setup_ui(self):
         # Navigation bar
         self._create_navigation_bar()
@@ -37,6 +43,11 @@ class SearchPage(BasePage):
                               command=self.select_face_image)
         face_btn.grid(row=0, column=0, padx=5)
 
+        probes_btn = ttk.Button(controls_frame,
+                                text="Select Probe Folder",
+                                command=self.select_probe_folder)
+        probes_btn.grid(row=0, column=3, padx=5)
+
         self.face_preview_label = ttk.Label(controls_frame)
         self.face_preview_label.grid(row=0, column=2, padx=5)
 
@@ -46,10 +57,16 @@ class SearchPage(BasePage):
 
         self.pkl_path_var = tk.StringVar(value="No collection selected")
         pkl_btn = ttk.Button(controls_frame,
-                             text="Select Face Collection (.pkl)",
+                             text="Select Face Collection",
                              command=self.select_pkl_file)
         pkl_btn.grid(row=1, column=0, padx=5, pady=5)
 
+        # Every collection of faces_indexed/ is searched concurrently and the hits merged
+        all_btn = ttk.Button(controls_frame,
+                             text="Search All Collections",
+                             command=self.select_all_collections)
+        all_btn.grid(row=1, column=3, padx=5, pady=5)
+
         self.pkl_info_label = ttk.Label(controls_frame)
         self.pkl_info_label.grid(row=1, column=2, padx=5)
 
@@ -72,6 +89,16 @@ class SearchPage(BasePage):
         # Results
         results_container = ttk.LabelFrame(self.content_frame, text="Matches", padding=10)
         results_container.pack(fill="both", expand=True)
+        pager_frame = ttk.Frame(results_container)
+        pager_frame.pack(side="bottom", fill="x", pady=(5, 0))
+        self.prev_btn = ttk.Button(pager_frame, text="< Previous", state="disabled",
+                                   command=lambda: self._show_page(self._page - 1))
+        self.prev_btn.pack(side="left")
+        self.next_btn = ttk.Button(pager_frame, text="Next >", state="disabled",
+                                   command=lambda: self._show_page(self._page + 1))
+        self.next_btn.pack(side="right")
+        self.page_label = ttk.Label(pager_frame, text="")
+        self.page_label.pack()
         self.results_canvas = tk.Canvas(results_container, bg="#ffffff")
         self.results_canvas.pack(side="left", fill="both", expand=True)
         scrollbar = ttk.Scrollbar(results_container, orient="vertical", command=self.results_canvas.yview)
@@ -83,8 +110,14 @@ class SearchPage(BasePage):
 
         # State
         self.selected_face = None
-        self.selected_pkl = None
-        self.match_images = []  # Keep references to PhotoImage objects
+        self.selected_probes = None  # Image paths of a probe folder, searched in one batch
+        self.selected_pkls = []  # One collection, or several searched concurrently
+        self.match_images = []  # Keep references to PhotoImage objects of the current page
+        self._rows = []  # (title, None, None) or (None, SearchResult, index) for every line of the results
+        self._page = 0
+        self._page_id = 0  # Incremented for every page shown, thumbnails of older pages are dropped
+        self._summary = ""
+        self._thumbnail_stores = {}  # collection path -> thumbnails saved with it, or None
 
     def select_face_image(self):
         path = filedialog.askopenfilename(
@@ -93,10 +126,20 @@ class SearchPage(BasePage):
         )
         if path:
             self.selected_face = path
+            self.selected_probes = None
             self.face_path_var.set(os.path.basename(path))
             self._update_face_preview(path)
             self._update_search_button_state()
 
+    def select_probe_folder(self):
+        folder = filedialog.askdirectory(title="Select folder of probe faces")
+        if folder:
+            self.selected_probes = collect_image_paths(folder, IMG_EXTENSIONS)
+            self.selected_face = None
+            self.face_path_var.set(f"{os.path.basename(folder)} ({len(self.selected_probes)} images)")
+            self.face_preview_label.config(image="")
+            self._update_search_button_state()
+
     def _update_face_preview(self, image_path):
         try:
             img = Image.open(image_path)
@@ -107,31 +150,48 @@ class SearchPage(BasePage):
             self.face_preview_label.config(image="")
 
     def select_pkl_file(self):
-        path = filedialog.askopenfilename(
-            title="Select face collection",
-            filetypes=[("Pickle files", "*.pkl"), ("All files", "*")]
+        paths = filedialog.askopenfilenames(
+            title="Select face collections",
+            filetypes=[("Face collections", "*.facedb *.pkl *.journal"), ("Pickle files", "*.pkl"), ("All files", "*")]
         )
-        if path:
-            self.selected_pkl = path
-            self.pkl_path_var.set(os.path.basename(path))
-            self._update_pkl_info(path)
-            self._update_search_button_state()
-
-    def _update_pkl_info(self, pkl_path):
+        if paths:
+            self.use_collections(list(paths))
+
+    def select_all_collections(self):
+        paths = collection_paths_in(os.path.join(os.getcwd(), "faces_indexed"))
+        if paths:
+            self.use_collections(paths)
+        else:
+            messagebox.showinfo("Search", "No collection found in faces_indexed.")
+
+    def use_collection(self, path):
+        self.use_collections([path])
+
+    def use_collections(self, paths):
+        self.selected_pkls = paths
+        if len(paths) == 1:
+            self.pkl_path_var.set(os.path.basename(paths[0]))
+        else:
+            self.pkl_path_var.set(f"{len(paths)} collections")
+        self._update_pkl_info(paths)
+        self._update_search_button_state()
+
+    def _update_pkl_info(self, pkl_paths):
+        # Counts come from the info sidecars; legacy collections get one the first time they are opened
         try:
-            with open(pkl_path, 'rb') as f:
-                faces = pickle.load(f)
-            self.pkl_info_label.config(text=f"{len(faces)} faces")
+            faces = sum((read_collection_info(path) or write_collection_info(path))["faces"] for path in pkl_paths)
+            self.pkl_info_label.config(text=f"{faces} faces")
         except Exception:
             self.pkl_info_label.config(text="Error")
 
     def _update_search_button_state(self):
-        self.search_btn.config(state="normal" if self.selected_face and self.selected_pkl else "disabled")
+        has_probe = self.selected_face or self.selected_probes
+        self.search_btn.config(state="normal" if has_probe and self.selected_pkls else "disabled")
 
     def run_search_thread(self):
-        for w in self.results_inner.winfo_children():
-            w.destroy()
-        self.match_images.clear()
+        self._rows = []
+        self._summary = ""
+        self._show_page(0)
         self.progress.pack(fill="x", pady=(0,10))
         self.progress.start(10)
         self.search_btn.config(state="disabled")
@@ -139,59 +199,129 @@ class SearchPage(BasePage):
 
     def _search_task(self):
         start_time = time.time()
+        # Each section is a (title, SearchResult or MultiSearchResult) pair; a single face image has no title
+        sections = []
+        timings = {}
+        paths = self.selected_pkls
         try:
-            matches = search_matches(self.selected_face, self.selected_pkl)
+            if self.selected_probes:
+                if len(paths) == 1:
+                    probes = search_batch(self.selected_probes, paths[0])
+                else:
+                    probes = search_batch_collections(self.selected_probes, paths)
+                for probe in probes:
+                    title = f"{os.path.basename(probe['probe'])} - face {probe['face']}"
+                    sections.append((title, probe["result"]))
+            else:
+                if len(paths) == 1:
+                    result = search_image(self.selected_face, paths[0])
+                else:
+                    result = search_collections(self.selected_face, paths)
+                if result is None:
+                    print("❌ No face found in the input image.")
+                else:
+                    sections.append((None, result))
+            if len(paths) > 1 and sections:
+                timings = sections[0][1].timings
+                for path, error in sections[0][1].errors.items():
+                    print(f"Error searching {os.path.basename(path)}: {error}")
+            self._thumbnail_stores = {path: ThumbnailStore.open(path) for path in paths}
         except Exception as e:
-            matches = []
             self.app.root.after(0, lambda: messagebox.showerror("Search Error", str(e)))
         end_time = time.time()
         duration = end_time - start_time
-        self.app.root.after(0, lambda: self._show_matches(matches, duration))
+        self.app.root.after(0, lambda: self._show_matches(sections, duration, timings))
 
-    def _show_matches(self, matches, duration=0):
+    def _show_matches(self, sections, duration=0, timings=None):
         self.progress.stop()
         self.progress.pack_forget()
         self.search_btn.config(state="normal")
 
-        try:
-            with open(self.selected_pkl, 'rb') as f:
-                face_entries = pickle.load(f)
-            entry_map = {f["name"]: f for f in face_entries}
-        except:
-            entry_map = {}
-
-        ttk.Label(self.results_inner,
-                text=f"Search completed in {duration:.2f} seconds",
-                font=('Arial', 10, 'italic')).pack(pady=(0, 10))
-
-        if not matches:
-            ttk.Label(self.results_inner, text="No matches found.", font=('Arial', 12)).pack(pady=10)
-            return
-
-        for name, distance in sorted(matches, key=lambda x: x[1]):
-            entry = entry_map.get(name)
+        self._summary = f"Search completed in {duration:.2f} seconds"
+        if timings:
+            # Collections were searched concurrently; the slowest ones bound the total
+            slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)
+            self._summary += f" across {len(timings)} collections\n" + ", ".join(
+                f"{os.path.basename(path)}: {seconds:.2f}s" for path, seconds in slowest)
+        self._rows = []
+        for title, result in sections:
+            if title is not None:
+                self._rows.append((f"{title}: {len(result)} match(es)", None, None))
+            self._rows.extend((None, result, index) for index in range(len(result)))
+        self._show_page(0)
+
+    def _show_page(self, page):
+        """Shows one page of results; collection entries and thumbnails are only loaded for its rows."""
+        for w in self.results_inner.winfo_children():
+            w.destroy()
+        self.match_images.clear()
+        self._page_id += 1
+        pages = max(1, -(-len(self._rows) // self.PAGE_SIZE))
+        self._page = page = min(max(0, page), pages - 1)
+        self.prev_btn.config(state="normal" if page > 0 else "disabled")
+        self.next_btn.config(state="normal" if page < pages - 1 else "disabled")
+        self.page_label.config(text=f"Page {page + 1} of {pages}" if self._rows else "")
+        self.results_canvas.yview_moveto(0)
+
+        if self._summary:
+            ttk.Label(self.results_inner, text=self._summary,
+                      font=('Arial', 10, 'italic')).pack(pady=(0, 10))
+            if not any(result is not None for _, result, _ in self._rows):
+                ttk.Label(self.results_inner, text="No matches found.", font=('Arial', 12)).pack(pady=10)
+                return
+
+        # Face crops and the original of every source photo on the page are rendered together
+        thumbnails = {}  # image path -> [(label, size, box)]
+        for title, result, index in self._rows[page * self.PAGE_SIZE:(page + 1) * self.PAGE_SIZE]:
+            if title is not None:
+                ttk.Label(self.results_inner, text=title,
+                          font=('Arial', 11, 'bold')).pack(anchor="w", pady=(10, 0))
+                continue
+            entry = result.entry(index)
+            collection_path = entry.get("collection", self.selected_pkls[0])
             frame = ttk.Frame(self.results_inner, padding=5)
             frame.pack(fill="x", pady=5)
 
             if entry:
-                try:
-                    img = Image.open(entry['image_path'])
-                    top, right, bottom, left = entry.get('location', (0,0,0,0))
-                    face_crop = img.crop((left, top, right, bottom))
-                    face_crop.thumbnail((80,80))
-                    face_img = ImageTk.PhotoImage(face_crop)
-                    self.match_images.append(face_img)
-                    ttk.Label(frame, image=face_img).pack(side="left", padx=5)
-
-                    orig_img = img.copy()
-                    orig_img.thumbnail((100,100))
-                    orig_img_tk = ImageTk.PhotoImage(orig_img)
-                    self.match_images.append(orig_img_tk)
-                    ttk.Label(frame, image=orig_img_tk).pack(side="left", padx=5)
-                except Exception:
-                    pass
+                # Placeholders are shown until the thumbnails are rendered in the background
+                face_label = ttk.Label(frame, text="...", width=10, anchor="center")
+                face_label.pack(side="left", padx=5)
+                orig_label = ttk.Label(frame, text="...", width=12, anchor="center")
+                orig_label.pack(side="left", padx=5)
+                requests = thumbnails.setdefault((collection_path, entry['image_path']), [])
+                requests.append((face_label, 80, entry.get('location')))
+                requests.append((orig_label, 100, None))
 
             info_frame = ttk.Frame(frame)
             info_frame.pack(side="left", fill="x", expand=True)
-            ttk.Label(info_frame, text=name, font=('Arial', 10, 'bold')).pack(anchor="w")
-            ttk.Label(info_frame, text=f"Confidence: {distance:.4f}", font=('Arial', 9)).pack(anchor="w")
+            ttk.Label(info_frame, text=entry["name"], font=('Arial', 10, 'bold')).pack(anchor="w")
+            ttk.Label(info_frame, text=f"Confidence: {result.distances[index]:.4f}", font=('Arial', 9)).pack(anchor="w")
+            if "collection" in entry:
+                ttk.Label(info_frame, text=f"Collection: {os.path.basename(collection_path)}",
+                          font=('Arial', 8), foreground="#666666").pack(anchor="w")
+
+        for (collection_path, image_path), requests in thumbnails.items():
+            self._load_thumbnails(image_path, requests, self._thumbnail_stores.get(collection_path))
+
+    def _load_thumbnails(self, image_path, requests, store=None):
+        """Renders the thumbnails of one source photo off-thread and shows them in their labels."""
+        page_id = self._page_id
+        # The original's thumbnail is the same for every face of the photo
+        specs = list(dict.fromkeys((size, tuple(box) if box is not None else None) for _, size, box in requests))
+
+        def show(future):
+            if page_id != self._page_id:
+                return
+            try:
+                images = dict(zip(specs, (ImageTk.PhotoImage(image) for image in future.result())))
+            except Exception:
+                for label, _, _ in requests:
+                    label.config(text="")
+                return
+            self.match_images.extend(images.values())
+            for label, size, box in requests:
+                label.config(image=images[(size, tuple(box) if box is not None else None)], text="", width=0)
+
+        future = thumbnail_service.submit_many(image_path, specs, wanted=lambda: page_id == self._page_id,
+                                               store=store)
+        future.add_done_callback(lambda f: self.app.root.after(0, show, f))
@@ -0,0 +1,199 @@
+"""
+Virtualized thumbnail grid used to preview large folders
+"""
+
+import math
+import os
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+from PIL import Image, ImageTk
+
+from thumbnail_service import thumbnail_service
+
+class _Slot:
+    """The widgets of one grid cell, reassigned to another path when recycled."""
+
+    def __init__(self, frame, image_label, name_label, window):
+        self.frame = frame
+        self.image_label = image_label
+        self.name_label = name_label
+        self.window = window
+        self.path = None
+
+class ThumbnailGrid:
+    """Grid of image thumbnails that only creates widgets for the visible rows.
+
+    Cells are laid out on a canvas with a fixed size. Scrolling hides the
+    cells that left the view and reuses their widgets for the ones that
+    entered it. Thumbnails come from the shared thumbnail service while a
+    placeholder is shown; the Tk thread only turns finished thumbnails into
+    PhotoImages, keeping the cache_size most recent ones.
+
+    on_click(path, shift) is called when a cell is clicked, shift telling
+    whether Shift was held, and is_selected(path) decides how a cell is
+    styled. Only the visible cells are ever restyled, so selection changes
+    cost the same whatever the number of paths.
+    """
+
+    def __init__(self, parent, on_click, is_selected, thumbnail_size=80, columns=6, cache_size=1000):
+        self.on_click = on_click
+        self.is_selected = is_selected
+        self.thumbnail_size = thumbnail_size
+        self.columns = columns
+        self.cache_size = cache_size
+        self.cell_width = thumbnail_size + 40
+        self.cell_height = thumbnail_size + 75
+        self.paths = []
+        self._positions = {}  # path -> index in paths
+
+        self.frame = ttk.Frame(parent)
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.canvas = tk.Canvas(self.frame, bg="#e0e0e0", highlightbackground="#cccccc", highlightthickness=1)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar_y = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scroll)
+        self.scrollbar_y.grid(row=0, column=1, sticky="ns")
+        self.canvas.config(yscrollcommand=self.scrollbar_y.set)
+        self.canvas.bind("<Configure>", lambda e: self.refresh())
+        self._bind_wheel(self.canvas)
+
+        self._slots = {}  # cell index -> _Slot
+        self._free_slots = []
+        self._images = OrderedDict()  # path -> PhotoImage, least recently used first
+        self._loading = set()
+        self._visible_paths = frozenset()
+        self._placeholder = ImageTk.PhotoImage(Image.new("RGB", (thumbnail_size, thumbnail_size), "#d9d9d9"))
+        self._broken = ImageTk.PhotoImage(Image.new("RGB", (thumbnail_size, thumbnail_size), "#f2c4c4"))
+
+    # Content
+    def clear(self):
+        self.paths = []
+        self._positions = {}
+        self.canvas.yview_moveto(0)
+        self.refresh()
+
+    def extend(self, paths):
+        self._positions.update((path, index) for index, path in enumerate(paths, len(self.paths)))
+        self.paths.extend(paths)
+        self.refresh()
+
+    def index(self, path):
+        """Position of path in the grid, or None."""
+        return self._positions.get(path)
+
+    def restyle(self, paths=None):
+        """Re-applies the selection style to the visible cells, or only to those showing paths."""
+        for slot in self._slots.values():
+            if paths is None or slot.path in paths:
+                self._style(slot)
+
+    # Scrolling
+    def _on_scroll(self, *args):
+        self.canvas.yview(*args)
+        self.refresh()
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.canvas.yview_scroll(-1, "units")
+        else:
+            self.canvas.yview_scroll(1, "units")
+        self.refresh()
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", self._on_wheel)
+        widget.bind("<Button-5>", self._on_wheel)
+
+    def refresh(self):
+        """Shows the cells of the visible rows, plus one row above and below."""
+        rows = math.ceil(len(self.paths) / self.columns)
+        self.canvas.config(scrollregion=(0, 0, self.columns * self.cell_width, rows * self.cell_height),
+                           yscrollincrement=self.cell_height // 3)
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // self.cell_height) - 1)
+        last_row = int((top + self.canvas.winfo_height()) // self.cell_height) + 1
+        visible = range(first_row * self.columns, min(len(self.paths), (last_row + 1) * self.columns))
+        self._visible_paths = frozenset(self.paths[index] for index in visible)
+
+        for index in [index for index in self._slots if index not in visible]:
+            slot = self._slots.pop(index)
+            self.canvas.itemconfigure(slot.window, state="hidden")
+            slot.path = None
+            self._free_slots.append(slot)
+        for index in visible:
+            slot = self._slots.get(index)
+            if slot is None:
+                slot = self._free_slots.pop() if self._free_slots else self._create_slot()
+                self._slots[index] = slot
+            if slot.path != self.paths[index]:
+                self._show(slot, index)
+
+    # Cells
+    def _create_slot(self):
+        frame = ttk.Frame(self.canvas, relief="solid", borderwidth=1, style="Thumbnail.TFrame")
+        image_label = ttk.Label(frame, image=self._placeholder, cursor="hand2")
+        image_label.pack(pady=5, padx=5)
+        name_label = ttk.Label(frame, wraplength=self.thumbnail_size + 20, anchor="center")
+        name_label.pack(pady=2)
+        window = self.canvas.create_window(0, 0, window=frame, anchor="nw",
+                                           width=self.cell_width - 20, height=self.cell_height - 30)
+        slot = _Slot(frame, image_label, name_label, window)
+        for widget in (frame, image_label, name_label):
+            widget.bind("<Button-1>", lambda e, s=slot: s.path is not None and self.on_click(s.path, bool(e.state & 0x0001)))
+            self._bind_wheel(widget)
+        return slot
+
+    def _show(self, slot, index):
+        path = self.paths[index]
+        slot.path = path
+        row, col = divmod(index, self.columns)
+        self.canvas.coords(slot.window, col * self.cell_width + 10, row * self.cell_height + 15)
+        self.canvas.itemconfigure(slot.window, state="normal")
+        slot.name_label.config(text=os.path.basename(path))
+        image = self._images.get(path)
+        if image is None:
+            image = self._placeholder
+            self._request(path)
+        else:
+            self._images.move_to_end(path)
+        slot.image_label.config(image=image)
+        self._style(slot)
+
+    def _style(self, slot):
+        if self.is_selected(slot.path):
+            slot.frame.config(borderwidth=3, relief="solid", style="Selected.TFrame")
+        else:
+            slot.frame.config(borderwidth=1, relief="solid", style="Thumbnail.TFrame")
+
+    # Asynchronous loading
+    def _request(self, path):
+        if path in self._loading:
+            return
+        self._loading.add(path)
+        # Rows scrolled past before their turn came are skipped, they are requested again when shown
+        future = thumbnail_service.submit(path, self.thumbnail_size, wanted=lambda: path in self._visible_paths)
+        future.add_done_callback(lambda f: self.canvas.after(0, self._on_loaded, path, f))
+
+    def _on_loaded(self, path, future):
+        self._loading.discard(path)
+        try:
+            thumbnail = future.result()
+        except Exception as e:
+            print(f"Error loading {path}: {e}")
+            image = self._broken
+        else:
+            if thumbnail is None:
+                if path in self._visible_paths:
+                    self._request(path)
+                return
+            image = ImageTk.PhotoImage(thumbnail)
+        self._images[path] = image
+        # Images still shown must stay referenced, or Tk would blank their labels
+        for _ in range(len(self._images) - self.cache_size):
+            oldest, oldest_image = self._images.popitem(last=False)
+            if oldest in self._visible_paths:
+                self._images[oldest] = oldest_image
+        for slot in self._slots.values():
+            if slot.path == path:
+                slot.image_label.config(image=image)
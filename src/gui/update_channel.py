@@ -0,0 +1,58 @@
+"""
+Throttled channel for posting UI updates from worker threads
+"""
+
+import threading
+import time
+
+class UpdateChannel:
+    """Batches updates posted from worker threads into at most max_rate UI refreshes per second.
+
+    post(item) queues an item (e.g. a face preview) and update(**state)
+    records the latest value of some state (e.g. progress), replacing older
+    values. Instead of one Tk callback per update, a single refresh is
+    scheduled on the Tk thread, where flush(items, state) receives everything
+    posted since the previous one. close() schedules a last refresh right away.
+    """
+
+    def __init__(self, root, flush, max_rate=10):
+        self.root = root
+        self.flush = flush
+        self.interval = 1.0 / max_rate
+        self._lock = threading.Lock()
+        self._items = []
+        self._state = {}
+        self._scheduled = False
+        self._last_flush = 0.0
+
+    def post(self, item):
+        with self._lock:
+            self._items.append(item)
+            self._schedule()
+
+    def update(self, **state):
+        with self._lock:
+            self._state.update(state)
+            self._schedule()
+
+    def close(self):
+        with self._lock:
+            self._scheduled = True
+        self.root.after(0, self._flush)
+
+    def _schedule(self):
+        # Called with the lock held
+        if self._scheduled:
+            return
+        self._scheduled = True
+        delay = max(0.0, self._last_flush + self.interval - time.monotonic())
+        self.root.after(int(delay * 1000), self._flush)
+
+    def _flush(self):
+        with self._lock:
+            items, self._items = self._items, []
+            state, self._state = self._state, {}
+            self._scheduled = False
+            self._last_flush = time.monotonic()
+        if items or state:
+            self.flush(items, state)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+
+CACHE_VERSION = 1
+_IMAGE_SUFFIX = ".jpg"
+_META_SUFFIX = ".json"
+# Writes after which the directory is rescanned anyway, to account for other processes sharing it
+_RESCAN_EVERY = 1000
+# Eviction frees down to this fraction of the budget, so the following writes do not trigger it again
+_EVICT_TO = 0.9
+
+def cache_key(source_path, settings):
+    """Content address of a derived image: the source file's path, mtime and size plus the settings used."""
+    stat = os.stat(source_path)
+    ident = [CACHE_VERSION, os.path.abspath(source_path), stat.st_mtime_ns, stat.st_size, settings]
+    return hashlib.sha1(json.dumps(ident, sort_keys=True).encode("utf-8")).hexdigest()
+
+class ImageCache:
+    """Persistent cache of images derived from source files, stored as JPEG files in cache_dir.
+
+    Each entry is <key>.jpg plus a <key>.json holding the metadata of the
+    derived image (see cache_key). A hit refreshes the entry's mtime, and once
+    the cache exceeds disk_budget the least recently used entries are
+    removed until it is back under _EVICT_TO of it. The cache size is
+    tracked in memory between scans of the directory, which only happen when
+    it crosses the budget or every _RESCAN_EVERY writes. Entries are written
+    atomically, so several processes can share one cache directory. hits
+    and misses only count lookups made in this process.
+    """
+
+    def __init__(self, cache_dir, disk_budget):
+        self.cache_dir = cache_dir
+        self.disk_budget = disk_budget
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None  # Bytes of JPEG data, unknown until the first scan
+        self._writes = 0
+
+    def __getstate__(self):
+        # Caches travel to worker processes with their loaders; the copy rescans on its first write
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_size"] = None
+        state["_writes"] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + _IMAGE_SUFFIX, base + _META_SUFFIX
+
+    def get(self, source_path, settings):
+        """Return (jpeg_path, metadata) of a cached image, or None."""
+        image_path, meta_path = self._paths(cache_key(source_path, settings))
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            os.utime(image_path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return image_path, meta
+
+    def put(self, source_path, settings, write_image, meta):
+        """Store an image and return the cached JPEG path.
+
+        write_image(path) writes the JPEG; the metadata is written last so an
+        entry is only visible once complete.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        image_path, meta_path = self._paths(cache_key(source_path, settings))
+        tmp_suffix = f".{os.getpid()}.tmp"
+        write_image(image_path + tmp_suffix)
+        size = os.path.getsize(image_path + tmp_suffix)
+        os.replace(image_path + tmp_suffix, image_path)
+        with open(meta_path + tmp_suffix, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + tmp_suffix, meta_path)
+        with self._lock:
+            self._writes += 1
+            if self._size is not None:
+                self._size += size  # Overestimated when an entry is rewritten, corrected by the next scan
+            scan = self._size is None or self._size > self.disk_budget or self._writes >= _RESCAN_EVERY
+        if scan:
+            self.evict()
+        return image_path
+
+    def evict(self):
+        """Remove least recently used entries if the cache exceeds its disk budget."""
+        with self._lock:
+            self._writes = 0
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(_IMAGE_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.name[:-len(_IMAGE_SUFFIX)]))
+                total += stat.st_size
+        if total > self.disk_budget:
+            for _, size, key in sorted(entries):
+                for path in self._paths(key):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                if total <= self.disk_budget * _EVICT_TO:
+                    break
+        with self._lock:
+            self._size = total
+
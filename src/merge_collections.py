@@ -0,0 +1,184 @@
+import argparse
+import os
+
+import numpy as np
+
+from ann_index import ann_path, build_collection_ann_index
+from collection_cache import collection_cache
+from face_collection import (FaceCollection, file_hash, info_path, journal_path, list_collections, load_collection,
+                             load_manifest, manifest_path, read_collection_info, resolve_collection_path,
+                             save_collection, save_manifest, write_collection_info)
+from thumbnail_store import ThumbnailStore, face_key, thumbs_index_path, thumbs_path
+
+def _collection_bytes(collection_path):
+    """Size on disk of a collection, with its journal and manifest."""
+    total = 0
+    for path in (collection_path, journal_path(collection_path), manifest_path(collection_path)):
+        try:
+            total += os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+    return total
+
+# Boxes of one source overlapping at least this much are the same face
+DEFAULT_MIN_IOU = 0.5
+
+def _iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    height = min(a[2], b[2]) - max(a[0], b[0])
+    width = min(a[1], b[1]) - max(a[3], b[3])
+    if height <= 0 or width <= 0:
+        return 0.0
+    inter = height * width
+    union = (a[2] - a[0]) * (a[1] - a[3]) + (b[2] - b[0]) * (b[1] - b[3]) - inter
+    return inter / union if union > 0 else 0.0
+
+class _SourceFiles:
+    """Existence and content hash of source images, each looked up once."""
+
+    def __init__(self):
+        self._exists = {}
+        self._hashes = {}
+
+    def exists(self, image_path):
+        if image_path not in self._exists:
+            self._exists[image_path] = os.path.exists(image_path)
+        return self._exists[image_path]
+
+    def identity(self, image_path, manifest):
+        """The sha1 recorded in the manifest, else the file's hash, else (file gone) its path."""
+        entry = manifest.get(image_path)
+        if entry and entry.get("sha1"):
+            return entry["sha1"]
+        if image_path not in self._hashes:
+            self._hashes[image_path] = file_hash(image_path) if self.exists(image_path) else "path:" + image_path
+        return self._hashes[image_path]
+
+def merge_collections(collection_paths, output_path, drop_missing=True, thumbnails=True, build_ann=False,
+                      min_iou=DEFAULT_MIN_IOU):
+    """Merge collections into one compact collection written to output_path.
+
+    A face is a duplicate when a face whose box overlaps it by at least
+    min_iou (intersection over union) was already kept from a source file
+    with the same content hash (from the manifests, or hashed when a
+    collection has none), whatever its path, so boxes found by another
+    detection mode or RAW decode still match: the first occurrence, in the
+    order of collection_paths, wins. With drop_missing
+    faces of source files that no longer exist are dropped. The manifests,
+    info sidecars and, with thumbnails, the thumbnail stores of the inputs
+    are merged too. output_path may be one of the inputs.
+
+    Returns a report dict with the rows and bytes before and after.
+    """
+    collection_paths = [resolve_collection_path(path) for path in collection_paths]
+    sources = _SourceFiles()
+    kept_boxes = {}  # source identity -> boxes of the faces kept from it
+    parts, manifest, source_roots, detectors = [], {}, set(), []
+    kept_thumbnails = []  # (input collection path, store key) of every thumbnail to copy
+    report = {"collections": len(collection_paths), "rows_in": 0, "duplicates": 0, "missing": 0,
+              "bytes_in": sum(_collection_bytes(path) for path in collection_paths)}
+
+    for collection_path in collection_paths:
+        collection = load_collection(collection_path)
+        collection_manifest = load_manifest(collection_path)
+        paths, path_ids = collection.paths, np.asarray(collection.path_ids)
+        locations = np.asarray(collection.locations)
+        keep = np.zeros(len(collection), dtype=bool)
+        for row in range(len(collection)):
+            image_path = paths[path_ids[row]]
+            if drop_missing and not sources.exists(image_path):
+                report["missing"] += 1
+                continue
+            boxes = kept_boxes.setdefault(sources.identity(image_path, collection_manifest), [])
+            box = locations[row].tolist()
+            if any(_iou(box, kept) >= min_iou for kept in boxes):
+                report["duplicates"] += 1
+                continue
+            boxes.append(box)
+            keep[row] = True
+            kept_thumbnails.append((collection_path, face_key(image_path, locations[row])))
+        report["rows_in"] += len(collection)
+        part = collection.select(keep)
+        parts.append(part)
+        kept_thumbnails.extend((collection_path, image_path) for image_path in part.paths)
+
+        # Images without faces stay in the manifest so incremental runs keep skipping them
+        for image_path, entry in collection_manifest.items():
+            if image_path not in manifest and (not drop_missing or sources.exists(image_path)):
+                manifest[image_path] = entry
+        info = read_collection_info(collection_path) or {}
+        source_roots.update(info.get("source_roots", []))
+        detectors.append(info.get("detector"))
+        del collection
+
+    merged = FaceCollection.concat(parts) if parts else FaceCollection.empty()
+    report["rows_out"] = len(merged)
+
+    # Thumbnails are copied before the output, which may be an input, is replaced
+    if thumbnails:
+        _merge_thumbnails(kept_thumbnails, output_path)
+
+    collection_cache.invalidate(output_path)  # Its mapping of an input would keep the file from being replaced on Windows
+    save_collection(output_path, merged)
+    save_manifest(output_path, manifest)
+    if os.path.exists(journal_path(output_path)):
+        os.remove(journal_path(output_path))
+    if os.path.exists(info_path(output_path)):
+        os.remove(info_path(output_path))  # Describes the collection that was replaced
+    detector = detectors[0] if detectors and all(d == detectors[0] for d in detectors) else None
+    write_collection_info(output_path, merged, sorted(source_roots), detector)
+    report["bytes_out"] = _collection_bytes(output_path)
+
+    if build_ann and len(merged):
+        build_collection_ann_index(output_path)
+        print(f"ANN index saved to '{ann_path(output_path)}'.")
+    return report
+
+def _merge_thumbnails(kept_thumbnails, output_path):
+    """Copy the kept thumbnails of the inputs' stores into the store of output_path."""
+    stores = {}
+    staging_path = output_path + ".merging"
+    merged_store = ThumbnailStore(staging_path, reset=True)
+    for collection_path, key in kept_thumbnails:
+        if collection_path not in stores:
+            stores[collection_path] = ThumbnailStore.open(collection_path)
+        store = stores[collection_path]
+        if store is not None and key not in merged_store:
+            data = store.get(key)
+            if data is not None:
+                merged_store.add(key, data)
+    merged_store.close()
+    if len(merged_store):
+        os.replace(thumbs_path(staging_path), thumbs_path(output_path))
+        os.replace(thumbs_index_path(staging_path), thumbs_index_path(output_path))
+    else:
+        for path in (thumbs_path(output_path), thumbs_index_path(output_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+def format_report(report):
+    saved_rows = report["rows_in"] - report["rows_out"]
+    saved_bytes = report["bytes_in"] - report["bytes_out"]
+    return (f"Merged {report['collections']} collection(s): {report['rows_in']} -> {report['rows_out']} faces "
+            f"({saved_rows} saved: {report['duplicates']} duplicate(s), {report['missing']} with a missing source), "
+            f"{report['bytes_in'] / (1 << 20):.1f} -> {report['bytes_out'] / (1 << 20):.1f} MiB "
+            f"({saved_bytes / (1 << 20):.1f} MiB saved)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge face collections into one, dropping duplicate faces.")
+    parser.add_argument("collections", nargs="+", help="collection files, or folders whose collections are all merged")
+    parser.add_argument("--output", required=True, help="collection file to write, .facedb or legacy .pkl")
+    parser.add_argument("--keep-missing", action="store_true", help="keep faces whose source file no longer exists")
+    parser.add_argument("--no-thumbnails", action="store_true", help="do not merge the thumbnail stores")
+    parser.add_argument("--min-iou", type=float, default=DEFAULT_MIN_IOU,
+                        help=f"box overlap above which faces of one photo are duplicates (default: {DEFAULT_MIN_IOU})")
+    parser.add_argument("--ann", action="store_true", help="also build an approximate nearest-neighbour index")
+    args = parser.parse_args()
+
+    inputs = []
+    for path in args.collections:
+        inputs.extend([collection for collection, _ in list_collections(path)] if os.path.isdir(path) else [path])
+    report = merge_collections(inputs, args.output, drop_missing=not args.keep_missing,
+                               thumbnails=not args.no_thumbnails, build_ann=args.ann, min_iou=args.min_iou)
+    print(f"✅ {format_report(report)}")
+    print(f"Collection saved to '{args.output}'.")
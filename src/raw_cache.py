@@ -0,0 +1,12 @@
+import os
+
+from image_cache import ImageCache
+
+DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), "raw_cache")
+DEFAULT_DISK_BUDGET = 2 << 30  # 2 GiB
+
+class RawCache(ImageCache):
+    """Persistent cache of RAW conversions, keyed by source file and conversion settings (see ImageCache)."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, disk_budget=DEFAULT_DISK_BUDGET):
+        super().__init__(cache_dir, disk_budget)
@@ -1,31 +1,259 @@
 import rawpy
-import imageio
+import hashlib
+import io
 import os
+import shutil
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image
 from tqdm import tqdm
+import numpy as np
 
-def convert_raw_to_jpeg(raw_path, jpeg_path):
+from utils.file_utils import is_raw_path
+
+# "full" demosaics at full resolution, "half" demosaics at half resolution
+# (4x fewer pixels) and "preview" uses the JPEG embedded by the camera,
+# falling back to a full decode when it is missing or too small.
+RAW_MODES = ("full", "half", "preview")
+# Smallest long side, in pixels, of an embedded preview usable for face detection
+MIN_PREVIEW_SIZE = 1024
+
+# LibRaw orientation codes -> PIL transpose that makes the preview upright
+_FLIP_TRANSPOSE = {
+    3: Image.Transpose.ROTATE_180,
+    5: Image.Transpose.ROTATE_90,
+    6: Image.Transpose.ROTATE_270,
+}
+
+def _embedded_preview(raw, min_preview_size=0):
+    """Return (image, jpeg_bytes) for the upright embedded preview, or None when it is missing or too small.
+
+    jpeg_bytes is the camera's JPEG when it can be used as is, otherwise None.
+    """
     try:
-        with rawpy.imread(raw_path) as raw:
-            rgb = raw.postprocess()
-            imageio.imwrite(jpeg_path, rgb)
-        return jpeg_path
-    except Exception as e:
-        print(f"Failed to convert {raw_path}: {e}")
+        thumb = raw.extract_thumb()
+    except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+        return None
+    if thumb.format == rawpy.ThumbFormat.JPEG:
+        image = Image.open(io.BytesIO(thumb.data))
+    else:
+        image = Image.fromarray(thumb.data)
+    if max(image.size) < min_preview_size:
         return None
 
-def convert_all_raw_images(raw_image_paths, raw_base=None, output_base='tmp_raw_converted'):
-    converted_paths = []
-    for raw_path in tqdm(raw_image_paths, desc="Converting RAW images", unit="img"):
-        if raw_base is None:
-            # Use the parent directory of the first image as the base
-            raw_base = os.path.dirname(os.path.dirname(raw_path))
-        
-        rel_path = os.path.relpath(raw_path, raw_base)
-        rel_path_jpg = os.path.splitext(rel_path)[0] + '.jpg'
-        jpeg_path = os.path.join(output_base, rel_path_jpg)
-        os.makedirs(os.path.dirname(jpeg_path), exist_ok=True)
-        converted_path = convert_raw_to_jpeg(raw_path, jpeg_path)
-        if converted_path:
-            converted_paths.append(converted_path)
-    
-    return converted_paths
+    transpose = _FLIP_TRANSPOSE.get(raw.sizes.flip)
+    if transpose is not None:
+        return image.transpose(transpose), None
+    return image, thumb.data if thumb.format == rawpy.ThumbFormat.JPEG else None
+
+def _write_jpeg(path, image, jpeg_bytes=None):
+    if jpeg_bytes is not None:
+        # Upright camera preview: keep its JPEG bytes as they are
+        with open(path, "wb") as f:
+            f.write(jpeg_bytes)
+    else:
+        image.convert("RGB").save(path, "JPEG", quality=95)
+
+def _full_side(raw):
+    """Longest side of a full postprocess() of this file."""
+    return max(raw.sizes.width, raw.sizes.height)
+
+def conversion_settings(mode, min_preview_size=MIN_PREVIEW_SIZE):
+    """Conversion settings, part of the RawCache key."""
+    return {"mode": mode, "min_preview_size": min_preview_size}
+
+def _decode_raw(raw_path, mode, min_preview_size):
+    """Decode a RAW file in the given mode.
+
+    Returns (image, jpeg_bytes, meta): a PIL image, the camera's JPEG when
+    the embedded preview can be used as is (else None), and
+    {"mode", "sha1", "scale", "raw_pixels"} where mode is the one actually
+    used and scale maps the image's coordinates to those of a full decode.
+    """
+    if mode not in RAW_MODES:
+        raise ValueError(f"Unknown RAW conversion mode: {mode}")
+    with open(raw_path, "rb") as f:
+        data = f.read()
+    with rawpy.imread(io.BytesIO(data)) as raw:
+        preview = _embedded_preview(raw, min_preview_size) if mode == "preview" else None
+        if preview is not None:
+            image, jpeg_bytes = preview
+        else:
+            mode = "full" if mode == "preview" else mode
+            image, jpeg_bytes = Image.fromarray(raw.postprocess(half_size=mode == "half")), None
+        meta = {
+            "mode": mode,
+            "sha1": hashlib.sha1(data).hexdigest(),
+            "scale": _full_side(raw) / max(image.size),
+            "raw_pixels": raw.sizes.raw_width * raw.sizes.raw_height,
+        }
+    return image, jpeg_bytes, meta
+
+def load_raw_image(raw_path, mode="full", min_preview_size=MIN_PREVIEW_SIZE, cache=None):
+    """Decode a RAW file in memory for face indexing, without writing a JPEG.
+
+    Returns (rgb, sha1, scale, report): the RGB array decoded in the given
+    mode (see RAW_MODES, "preview" falls back to a full decode), the sha1 of
+    the file, the factor mapping its pixel coordinates to those of a full
+    decode and a {"raw_path", "mode", "cached", "seconds", "raw_pixels"}
+    report for ConversionStats. This is the image_loader contract of
+    face_indexer.index_faces. With a RawCache, a previous conversion is read
+    back from its JPEG instead and new ones are stored.
+    """
+    start = time.perf_counter()
+    settings = conversion_settings(mode, min_preview_size)
+    cached = cache.get(raw_path, settings) if cache is not None else None
+    if cached is not None:
+        jpeg_path, meta = cached
+        with Image.open(jpeg_path) as image:
+            rgb = np.asarray(image.convert("RGB"))
+    else:
+        image, jpeg_bytes, meta = _decode_raw(raw_path, mode, min_preview_size)
+        if cache is not None:
+            cache.put(raw_path, settings, lambda path: _write_jpeg(path, image, jpeg_bytes), meta)
+        rgb = np.asarray(image.convert("RGB"))
+    report = {"raw_path": raw_path, "mode": meta["mode"], "cached": cached is not None,
+              "seconds": time.perf_counter() - start, "raw_pixels": meta["raw_pixels"]}
+    return rgb, meta["sha1"], meta["scale"], report
+
+def open_image(image_path):
+    """Open any supported image for display as (PIL image, scale).
+
+    RAW files are shown from their embedded preview, or a half size decode
+    when they have none. scale maps the coordinates of a full decode (the
+    ones face locations are stored in) to those of the returned image.
+    """
+    if not is_raw_path(image_path):
+        return Image.open(image_path), 1.0
+    with rawpy.imread(image_path) as raw:
+        preview = _embedded_preview(raw)
+        if preview is not None:
+            image = preview[0]
+        else:
+            image = Image.fromarray(raw.postprocess(half_size=True))
+        return image, max(image.size) / _full_side(raw)
+
+def convert_raw_image(raw_path, jpeg_path, mode="full", min_preview_size=MIN_PREVIEW_SIZE, cache=None):
+    """Convert one RAW file and report how it was done.
+
+    Returns {"raw_path", "jpeg_path", "mode", "cached", "seconds", "raw_pixels"}
+    where mode is the one actually used and jpeg_path is None on failure.
+    With a RawCache, cached conversions are copied instead of decoded.
+    """
+    if mode not in RAW_MODES:
+        raise ValueError(f"Unknown RAW conversion mode: {mode}")
+    start = time.perf_counter()
+    report = {"raw_path": raw_path, "jpeg_path": None, "mode": mode, "cached": False, "seconds": 0.0, "raw_pixels": 0}
+    try:
+        settings = conversion_settings(mode, min_preview_size)
+        cached = cache.get(raw_path, settings) if cache is not None else None
+        if cached is not None:
+            shutil.copyfile(cached[0], jpeg_path)
+            meta = cached[1]
+            report["cached"] = True
+        else:
+            image, jpeg_bytes, meta = _decode_raw(raw_path, mode, min_preview_size)
+            _write_jpeg(jpeg_path, image, jpeg_bytes)
+            if cache is not None:
+                cache.put(raw_path, settings, lambda path: shutil.copyfile(jpeg_path, path), meta)
+        report.update(jpeg_path=jpeg_path, mode=meta["mode"], raw_pixels=meta["raw_pixels"])
+    except Exception as e:
+        print(f"Failed to convert {raw_path}: {e}", flush=True)
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+def convert_raw_to_jpeg(raw_path, jpeg_path, mode="full", cache=None):
+    return convert_raw_image(raw_path, jpeg_path, mode, cache=cache)["jpeg_path"]
+
+class ConversionStats:
+    """Per-mode counts and the time saved compared to full decodes.
+
+    The cost of a full decode is estimated per raw pixel from the full
+    decodes seen so far, so savings are only known once at least one file
+    went through (or fell back to) a full decode. Cache hits are counted
+    apart and never used for the estimate.
+    """
+
+    def __init__(self):
+        self.counts = {mode: 0 for mode in RAW_MODES}
+        self.cached = 0
+        self.seconds_saved = 0.0
+        self._full_seconds = 0.0
+        self._full_pixels = 0
+
+    def add(self, report):
+        """Record a successful conversion report and return its estimated saving in seconds, or None."""
+        if report["cached"]:
+            self.cached += 1
+        else:
+            self.counts[report["mode"]] += 1
+            if report["mode"] == "full":
+                self._full_seconds += report["seconds"]
+                self._full_pixels += report["raw_pixels"]
+                return 0.0
+        if not self._full_pixels:
+            return None
+        saved = self._full_seconds / self._full_pixels * report["raw_pixels"] - report["seconds"]
+        self.seconds_saved += saved
+        return saved
+
+    def summary(self):
+        counts = [f"{count} {mode}" for mode, count in self.counts.items() if count]
+        if self.cached:
+            counts.append(f"{self.cached} cached")
+        return f"RAW conversion: {', '.join(counts) or 'nothing converted'}, ~{self.seconds_saved:.1f}s saved"
+
+def report_line(report, saved):
+    """One line telling how a file was converted, for the per-file log."""
+    saved_str = "n/a" if saved is None else f"~{saved:.2f}s"
+    mode = f"{report['mode']} (cached)" if report["cached"] else report["mode"]
+    return f"{os.path.basename(report['raw_path'])}: {mode} in {report['seconds']:.2f}s (saved {saved_str})"
+
+def _jpeg_path_for(raw_path, raw_base, output_base):
+    rel_path = os.path.relpath(raw_path, raw_base)
+    rel_path_jpg = os.path.splitext(rel_path)[0] + '.jpg'
+    jpeg_path = os.path.join(output_base, rel_path_jpg)
+    os.makedirs(os.path.dirname(jpeg_path), exist_ok=True)
+    return jpeg_path
+
+def iter_convert_raw_images(raw_image_paths, raw_base=None, output_base='tmp_raw_converted', workers=1, mode="full", cache=None):
+    """Convert RAW images and yield each JPEG path as soon as it is written.
+
+    With workers > 1 conversions run in a process pool and paths are yielded
+    in completion order, so a consumer such as index_faces can start on the
+    first images while the rest are still being converted. The mode used and
+    the time saved are printed for every file (see RAW_MODES). Files already
+    in the RawCache given as cache are copied instead of converted.
+    """
+    raw_image_paths = list(raw_image_paths)
+    if not raw_image_paths:
+        return
+    if raw_base is None:
+        # Use the parent directory of the first image as the base
+        raw_base = os.path.dirname(os.path.dirname(raw_image_paths[0]))
+    jobs = [(raw_path, _jpeg_path_for(raw_path, raw_base, output_base)) for raw_path in raw_image_paths]
+    stats = ConversionStats()
+
+    def _converted(report):
+        if report["jpeg_path"]:
+            tqdm.write(report_line(report, stats.add(report)))
+        return report["jpeg_path"]
+
+    if workers <= 1:
+        for raw_path, jpeg_path in tqdm(jobs, desc="Converting RAW images", unit="img"):
+            converted_path = _converted(convert_raw_image(raw_path, jpeg_path, mode, cache=cache))
+            if converted_path:
+                yield converted_path
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(convert_raw_image, raw_path, jpeg_path, mode, cache=cache) for raw_path, jpeg_path in jobs]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Converting RAW images", unit="img"):
+                converted_path = _converted(future.result())
+                if converted_path:
+                    yield converted_path
+    print(stats.summary())
+
+def convert_all_raw_images(raw_image_paths, raw_base=None, output_base='tmp_raw_converted', workers=1, mode="full", cache=None):
+    return list(iter_convert_raw_images(raw_image_paths, raw_base, output_base, workers, mode, cache))
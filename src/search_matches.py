@@ -1,34 +1,276 @@
-import pickle
 import face_recognition
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
-import face_recognition
-def search_matches(image_path, indexed_faces_file, tolerance=0.6):
-    with open(indexed_faces_file, "rb") as f:
-        known_faces = pickle.load(f)
+from ann_index import load_ann_index
+from collection_cache import get_collection
+from face_collection import list_collections
+from utils.file_utils import collect_image_paths, IMG_EXTENSIONS
+
+_BLOCK_ROWS = 65536
+
+class SearchResult:
+    """Matches of one probe encoding: collection row ids and distances, closest first.
+
+    Names and entries are looked up in the collection only for the returned
+    rows, and only when asked for.
+    """
+
+    def __init__(self, collection, rows, distances):
+        self.collection = collection
+        self.rows = rows
+        self.distances = distances
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def names(self):
+        names = self.collection.names
+        return [names[row] for row in self.rows]
+
+    def entry(self, index):
+        return self.collection.entry(self.rows[index])
+
+    def entries(self):
+        return [self.collection.entry(row) for row in self.rows]
+
+    def pairs(self):
+        """(name, distance) tuples, the format search_matches has always returned."""
+        return list(zip(self.names, self.distances.tolist()))
+
+def _distances(encodings, encoding):
+    """Euclidean distances from encoding to every row, computed in blocks to bound temporaries."""
+    encoding = np.asarray(encoding, dtype=np.float32)
+    distances = np.empty(len(encodings), dtype=np.float32)
+    for start in range(0, len(encodings), _BLOCK_ROWS):
+        block = encodings[start:start + _BLOCK_ROWS]
+        distances[start:start + len(block)] = np.linalg.norm(block - encoding, axis=1)
+    return distances
+
+def _select(rows, distances, tolerance=None, top_k=None):
+    """Keep rows within tolerance, then the top_k closest, sorted by distance."""
+    if tolerance is not None:
+        within = distances <= tolerance
+        rows, distances = rows[within], distances[within]
+    if top_k is not None and len(rows) > top_k:
+        closest = np.argpartition(distances, top_k - 1)[:top_k]
+        rows, distances = rows[closest], distances[closest]
+    order = np.argsort(distances, kind="stable")
+    return rows[order], distances[order]
+
+def search_encodings(collection, encoding, tolerance=0.6, top_k=None, ann=None, recall=None):
+    """Search a FaceCollection for one encoding and return a SearchResult.
+
+    At least one of tolerance and top_k should be given. With an up-to-date
+    AnnIndex and a recall target only its candidate rows are compared.
+    """
+    if ann is not None and recall is not None and ann.count == len(collection):
+        rows, distances = ann.search(collection.encodings, encoding, np.inf if tolerance is None else tolerance, recall=recall)
+    else:
+        distances = _distances(collection.encodings, encoding)
+        rows = np.arange(len(distances))
+    rows, distances = _select(rows, distances, tolerance, top_k)
+    return SearchResult(collection, rows, distances)
+
+class MultiSearchResult:
+    """Matches of one probe in several collections, merged into one list, closest first.
+
+    Hit i comes from collection_paths[sources[i]], where it is hit indices[i]
+    of results[sources[i]]. timings maps every collection path to the
+    seconds spent loading and searching it, and errors the collections that
+    could not be searched to their error message.
+    """
+
+    def __init__(self, collection_paths, results, timings=None, errors=None, top_k=None):
+        self.collection_paths = collection_paths
+        self.results = results
+        self.timings = timings or {}
+        self.errors = errors or {}
+        sources = [np.full(len(result), source, dtype=np.int32) for source, result in enumerate(results)]
+        indices = [np.arange(len(result)) for result in results]
+        distances = np.concatenate([result.distances for result in results] or [np.empty(0, np.float32)])
+        order = np.argsort(distances, kind="stable")[:top_k]
+        self.sources = np.concatenate(sources or [np.empty(0, np.int32)])[order]
+        self.indices = np.concatenate(indices or [np.empty(0, np.int64)])[order]
+        self.distances = distances[order]
+
+    def __len__(self):
+        return len(self.distances)
+
+    def collection_path(self, index):
+        return self.collection_paths[self.sources[index]]
+
+    def entry(self, index):
+        """Entry of hit index, with the path of its collection under "collection"."""
+        entry = self.results[self.sources[index]].entry(self.indices[index])
+        entry["collection"] = self.collection_path(index)
+        return entry
+
+    def entries(self):
+        return [self.entry(index) for index in range(len(self))]
+
+    @property
+    def names(self):
+        return [self.results[source].names[index] for source, index in zip(self.sources, self.indices)]
 
+    def pairs(self):
+        return list(zip(self.names, self.distances.tolist()))
+
+def _first_encoding(image_path):
+    """Encoding of the first face found in an image, or None."""
     new_image = face_recognition.load_image_file(image_path)
     new_encodings = face_recognition.face_encodings(new_image)
+    return new_encodings[0] if new_encodings else None
 
-    if not new_encodings:
-        print("❌ No face found in the input image.")
+def search_image(image_path, indexed_faces_file, tolerance=0.6, top_k=None, recall=None):
+    """Search a collection for the first face of an image; None when the image has no face."""
+    collection = get_collection(indexed_faces_file)
+
+    encoding = _first_encoding(image_path)
+    if encoding is None:
+        return None
+
+    # With a recall target, use the collection's ANN index when it is up to date
+    ann = load_ann_index(indexed_faces_file) if recall is not None else None
+    return search_encodings(collection, encoding, tolerance, top_k, ann=ann, recall=recall)
+
+def encode_probe(image_path):
+    """Return (location, encoding) for every face found in a probe image."""
+    image = face_recognition.load_image_file(image_path)
+    locations = face_recognition.face_locations(image)
+    return list(zip(locations, face_recognition.face_encodings(image, locations)))
+
+def _probe_queries(probes):
+    """One {"probe", "face", "location", "encoding"} dict per probe face (see search_batch)."""
+    queries = []
+    for probe_index, probe in enumerate(probes):
+        if isinstance(probe, str):
+            faces = encode_probe(probe)
+            if not faces:
+                print(f"[Warning] No face found in probe {os.path.basename(probe)}")
+            for face_index, (location, encoding) in enumerate(faces):
+                queries.append({"probe": probe, "face": face_index, "location": location, "encoding": encoding})
+        else:
+            queries.append({"probe": probe_index, "face": 0, "location": None, "encoding": probe})
+    return queries
+
+def search_batch(probes, indexed_faces_file, tolerance=0.6, top_k=None, block_rows=_BLOCK_ROWS):
+    """Search a collection for many probes in one pass over its encodings.
+
+    probes may mix image paths, in which case every face of the image is a
+    probe, and raw 128-d encodings. The probes x collection distance matrix
+    is computed one block of collection rows at a time, and per block only
+    the rows within tolerance (and the block's top_k) are kept.
+
+    Returns one dict per probe face: {"probe", "face", "location", "result"}
+    where result is a SearchResult.
+    """
+    collection = get_collection(indexed_faces_file)
+
+    queries = _probe_queries(probes)
+    if not queries:
         return []
 
-    new_encoding = new_encodings[0]
-    known_encodings = [face["encoding"] for face in known_faces]
-    names = [face["name"] for face in known_faces]
+    probe_matrix = np.array([query["encoding"] for query in queries], dtype=np.float64)
+    probe_norms = (probe_matrix * probe_matrix).sum(axis=1)[:, None]
+    kept_rows = [[] for _ in queries]
+    kept_distances = [[] for _ in queries]
+    encodings = collection.encodings
+    for start in range(0, len(encodings), block_rows):
+        block = np.asarray(encodings[start:start + block_rows], dtype=np.float64)
+        squared = probe_norms - 2.0 * probe_matrix @ block.T + (block * block).sum(axis=1)[None, :]
+        distances = np.sqrt(np.maximum(squared, 0.0)).astype(np.float32)
+        for i, row_distances in enumerate(distances):
+            rows, row_distances = _select(np.arange(start, start + len(block)), row_distances, tolerance, top_k)
+            kept_rows[i].append(rows)
+            kept_distances[i].append(row_distances)
+
+    results = []
+    for query, rows, distances in zip(queries, kept_rows, kept_distances):
+        rows, distances = _select(np.concatenate(rows), np.concatenate(distances), tolerance, top_k)
+        results.append({"probe": query["probe"], "face": query["face"], "location": query["location"],
+                        "result": SearchResult(collection, rows, distances)})
+    return results
+
+def collection_paths_in(directory):
+    """Paths of every collection in a directory, e.g. faces_indexed/."""
+    return [path for path, _ in list_collections(directory)]
 
-    distances = face_recognition.face_distance(known_encodings, new_encoding)
+def _search_each(collection_paths, search, workers=None):
+    """Run search(collection_path) for every collection in a thread pool.
 
-    # Collect all matches within tolerance
-    matched = []
-    for name, distance in zip(names, distances):
-        if distance <= tolerance:
-            matched.append((name, distance))
+    Loading (memory-mapped reads) and the NumPy distance computations release
+    the GIL, so collections are searched concurrently without copying them
+    into worker processes. Returns (paths searched, their results, timings,
+    errors), in the order of collection_paths.
+    """
+    def timed(collection_path):
+        start = time.perf_counter()
+        try:
+            return search(collection_path), None, time.perf_counter() - start
+        except Exception as e:
+            return None, str(e), time.perf_counter() - start
+
+    workers = workers or min(8, len(collection_paths)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(timed, collection_paths))
+    searched, results, timings, errors = [], [], {}, {}
+    for collection_path, (result, error, seconds) in zip(collection_paths, outcomes):
+        timings[collection_path] = seconds
+        if error is not None:
+            errors[collection_path] = error
+            continue
+        searched.append(collection_path)
+        results.append(result)
+    return searched, results, timings, errors
+
+def search_collections(image_path, collection_paths, tolerance=0.6, top_k=None, recall=None, workers=None):
+    """Search several collections for the first face of an image, concurrently.
+
+    The probe is encoded once. Returns a MultiSearchResult holding the
+    top_k closest hits of all collections, or None when the image has no face.
+    """
+    encoding = _first_encoding(image_path)
+    if encoding is None:
+        return None
+
+    def search(collection_path):
+        ann = load_ann_index(collection_path) if recall is not None else None
+        return search_encodings(get_collection(collection_path), encoding, tolerance, top_k, ann=ann, recall=recall)
+
+    searched, results, timings, errors = _search_each(collection_paths, search, workers)
+    return MultiSearchResult(searched, results, timings, errors, top_k)
+
+def search_batch_collections(probes, collection_paths, tolerance=0.6, top_k=None, workers=None):
+    """search_batch over several collections, concurrently; every result is a MultiSearchResult.
+
+    Probes are encoded once and every collection is searched for all of them
+    in one pass (see search_batch).
+    """
+    queries = _probe_queries(probes)
+    if not queries:
+        return []
+    encodings = [query["encoding"] for query in queries]
+    searched, batches, timings, errors = _search_each(
+        collection_paths, lambda collection_path: search_batch(encodings, collection_path, tolerance, top_k), workers)
+    return [{"probe": query["probe"], "face": query["face"], "location": query["location"],
+             "result": MultiSearchResult(searched, [batch[i]["result"] for batch in batches], timings, errors, top_k)}
+            for i, query in enumerate(queries)]
+
+def search_matches(image_path, indexed_faces_file, tolerance=0.6, recall=None, top_k=None):
+    result = search_image(image_path, indexed_faces_file, tolerance, top_k, recall)
+    if result is None:
+        print("❌ No face found in the input image.")
+        return []
 
+    matched = result.pairs()
     if matched:
         print("✅ Matches found:")
-        for name, dist in sorted(matched, key=lambda x: x[1]):
+        for name, dist in matched:
             print(f" - {name} (distance: {dist:.4f})")
     else:
         print("❌ No match found under tolerance.")
@@ -37,12 +279,40 @@ def search_matches(image_path, indexed_faces_file, tolerance=0.6):
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: python search_face.py <image_path> <indexed_faces_file>")
+        print("Usage: python search_face.py <image_path|probe_folder> <indexed_faces_file|collections_folder> [recall]")
         sys.exit(1)
 
     image_path = sys.argv[1]
     indexed_faces_file = sys.argv[2]
-    matches = search_matches(image_path, indexed_faces_file)
+    recall = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    if os.path.isdir(indexed_faces_file):
+        # Every collection of the folder is searched concurrently and the hits merged
+        collection_paths = collection_paths_in(indexed_faces_file)
+        if os.path.isdir(image_path):
+            probes = search_batch_collections(collect_image_paths(image_path, IMG_EXTENSIONS), collection_paths)
+        else:
+            result = search_collections(image_path, collection_paths, recall=recall)
+            probes = [] if result is None else [{"probe": image_path, "face": 0, "result": result}]
+        for probe in probes:
+            result = probe["result"]
+            print(f"{os.path.basename(probe['probe'])} (face {probe['face']}): {len(result)} match(es)")
+            for index, (name, distance) in enumerate(result.pairs()):
+                print(f" - {name} (distance: {distance:.4f}) in {os.path.basename(result.collection_path(index))}")
+        if probes:
+            for collection_path, seconds in probes[0]["result"].timings.items():
+                error = probes[0]["result"].errors.get(collection_path)
+                print(f"{os.path.basename(collection_path)}: {seconds:.3f}s" + (f" ({error})" if error else ""))
+        else:
+            print("No face found in the input.")
+        sys.exit(0)
+    if os.path.isdir(image_path):
+        # Every face of every image in the folder is searched in one pass
+        for probe in search_batch(collect_image_paths(image_path, IMG_EXTENSIONS), indexed_faces_file):
+            print(f"{os.path.basename(probe['probe'])} (face {probe['face']}): {len(probe['result'])} match(es)")
+            for name, distance in probe["result"].pairs():
+                print(f" - {name} (distance: {distance:.4f})")
+        sys.exit(0)
+    matches = search_matches(image_path, indexed_faces_file, recall=recall)
     if matches:
         print("Matches found:")
         for name, distance in matches:
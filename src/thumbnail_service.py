@@ -0,0 +1,141 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from image_cache import ImageCache
+from raw_converter import open_image
+from thumbnail_store import face_key, FACE_THUMBNAIL_SIZE, IMAGE_THUMBNAIL_SIZE, ORIENTATION_TRANSPOSE
+from utils.file_utils import is_raw_path
+
+DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), "thumbnail_cache")
+DEFAULT_DISK_BUDGET = 512 << 20  # 512 MiB
+
+def render_thumbnails(path, specs):
+    """Decode path once and return an upright RGB thumbnail for every (size, box) in specs.
+
+    Each thumbnail is at most size x size pixels. box is an optional
+    (top, right, bottom, left) face location, in the coordinates face
+    locations are stored in, to thumbnail instead of the whole image. JPEG
+    files are decoded at the smallest DCT scale that still gives every
+    thumbnail its size (PIL draft mode), RAW files from their embedded preview.
+    """
+    image, scale = open_image(path)
+    width, height = image.size
+    boxes = []
+    draft_scale = 0.0
+    for size, box in specs:
+        if box is not None:
+            top, right, bottom, left = (value * scale for value in box)
+            box = (left, top, right, bottom)
+            # The face, not the whole image, must keep at least size pixels
+            draft_scale = max(draft_scale, size / max(1, min(right - left, bottom - top)))
+        else:
+            draft_scale = max(draft_scale, size / max(1, min(width, height)))
+        boxes.append(box)
+    if image.format == "JPEG":
+        image.draft("RGB", (math.ceil(width * draft_scale), math.ceil(height * draft_scale)))
+    reduction = image.size[0] / width
+
+    orientation = None if is_raw_path(path) else image.getexif().get(0x0112)
+    thumbnails = []
+    for (size, _), box in zip(specs, boxes):
+        if box is not None:
+            thumbnail = image.crop(tuple(round(value * reduction) for value in box))
+        else:
+            thumbnail = image.copy()
+        if orientation in ORIENTATION_TRANSPOSE:
+            thumbnail = thumbnail.transpose(ORIENTATION_TRANSPOSE[orientation])
+        thumbnail.thumbnail((size, size))
+        thumbnails.append(thumbnail.convert("RGB"))
+    return thumbnails
+
+def render_thumbnail(path, size, box=None):
+    """Decode one thumbnail (see render_thumbnails)."""
+    return render_thumbnails(path, [(size, box)])[0]
+
+class ThumbnailService:
+    """Shared source of image and face thumbnails for the GUI pages.
+
+    Thumbnails are rendered by a thread pool and kept in an ImageCache on
+    disk, keyed by the source file's path, mtime and size plus the requested
+    size and face box, so a folder seen before costs one small JPEG read per
+    thumbnail.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, disk_budget=DEFAULT_DISK_BUDGET, workers=4):
+        self.cache = ImageCache(cache_dir, disk_budget)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def thumbnails(self, path, specs, store=None):
+        """Return the thumbnails of path for every (size, box) in specs (see render_thumbnails). Blocking.
+
+        Thumbnails are taken from the collection's ThumbnailStore when given
+        and large enough, then from the disk cache; the source is decoded at
+        most once for all the others.
+        """
+        thumbnails = [None] * len(specs)
+        missing = []
+        for index, (size, box) in enumerate(specs):
+            stored = self._from_store(store, path, size, box)
+            if stored is not None:
+                thumbnails[index] = stored
+                continue
+            cached = self.cache.get(path, self._settings(size, box))
+            if cached is not None:
+                try:
+                    with Image.open(cached[0]) as image:
+                        thumbnails[index] = image.convert("RGB")
+                    continue
+                except OSError:
+                    pass  # Evicted or truncated meanwhile, render it again
+            missing.append(index)
+        if missing:
+            rendered = render_thumbnails(path, [specs[index] for index in missing])
+            for index, image in zip(missing, rendered):
+                thumbnails[index] = image
+                self.cache.put(path, self._settings(*specs[index]),
+                               lambda cache_path, image=image: image.save(cache_path, "JPEG", quality=85), {})
+        return thumbnails
+
+    def thumbnail(self, path, size, box=None, store=None):
+        """Return one thumbnail, from the store or the disk cache when possible. Blocking."""
+        return self.thumbnails(path, [(size, box)], store)[0]
+
+    @staticmethod
+    def _from_store(store, path, size, box):
+        if store is None or size > (IMAGE_THUMBNAIL_SIZE if box is None else FACE_THUMBNAIL_SIZE):
+            return None
+        try:
+            image = store.image(path if box is None else face_key(path, box))
+        except OSError:
+            return None  # Unreadable store, fall back to the source
+        if image is not None:
+            image.thumbnail((size, size))
+        return image
+
+    @staticmethod
+    def _settings(size, box):
+        return {"size": size, "box": list(box) if box is not None else None}
+
+    def submit(self, path, size, box=None, wanted=None, store=None):
+        """Render a thumbnail in the background and return its Future.
+
+        wanted is an optional callable checked when a worker picks the job up;
+        when it returns False the job is skipped and the Future resolves to None.
+        """
+        return self._submit(lambda: self.thumbnail(path, size, box, store), wanted)
+
+    def submit_many(self, path, specs, wanted=None, store=None):
+        """Like submit, for a list of thumbnails of one source, decoded once (see thumbnails)."""
+        return self._submit(lambda: self.thumbnails(path, specs, store), wanted)
+
+    def _submit(self, render, wanted):
+        def job():
+            if wanted is not None and not wanted():
+                return None
+            return render()
+        return self._executor.submit(job)
+
+thumbnail_service = ThumbnailService()
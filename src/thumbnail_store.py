@@ -0,0 +1,192 @@
+import io
+import json
+import os
+import threading
+
+from PIL import Image
+
+from face_collection import resolve_collection_path
+from utils.file_utils import is_raw_path
+
+THUMBS_SUFFIX = ".thumbs"
+THUMBS_MAGIC = b"FACETHB1"
+THUMBS_VERSION = 1
+FACE_THUMBNAIL_SIZE = 100
+IMAGE_THUMBNAIL_SIZE = 150
+_JPEG_QUALITY = 85
+
+# EXIF orientation -> transpose making the image upright, as in ImageOps.exif_transpose
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+def thumbs_path(collection_path):
+    return collection_path + THUMBS_SUFFIX
+
+def thumbs_index_path(collection_path):
+    return thumbs_path(collection_path) + ".json"
+
+def face_key(image_path, location):
+    """Store key of a face crop: its image path and location, in the coordinates stored in the collection."""
+    return f"{image_path}#{','.join(str(int(value)) for value in location)}"
+
+def _jpeg_bytes(image, orientation, size):
+    if orientation in ORIENTATION_TRANSPOSE:
+        image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+    image.thumbnail((size, size))
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=_JPEG_QUALITY)
+    return buffer.getvalue()
+
+def encode_thumbnails(image, image_path, face_locations):
+    """Encode the thumbnails stored for one indexed image from its decoded RGB array.
+
+    Returns {"image": jpeg bytes, "faces": [jpeg bytes per face location]}.
+    Locations are in the coordinates of image. Thumbnails are made upright
+    with the file's EXIF orientation; RAW images are decoded upright already.
+    """
+    orientation = None
+    if not is_raw_path(image_path):
+        try:
+            with Image.open(image_path) as source:
+                orientation = source.getexif().get(0x0112)
+        except OSError:
+            pass
+    pil_image = Image.fromarray(image)
+    faces = [_jpeg_bytes(pil_image.crop((left, top, right, bottom)), orientation, FACE_THUMBNAIL_SIZE)
+             for top, right, bottom, left in face_locations]
+    return {"image": _jpeg_bytes(pil_image.copy(), orientation, IMAGE_THUMBNAIL_SIZE), "faces": faces}
+
+class ThumbnailStore:
+    """Face crops and source thumbnails kept next to a collection.
+
+    The JPEG data of every thumbnail is appended to <collection>.thumbs and
+    located through an {key: [offset, length]} index in
+    <collection>.thumbs.json, so showing a search hit reads a few KB instead
+    of its original photo. Keys are the image path for a source thumbnail and
+    face_key() for a face crop. Replaced thumbnails stay in the blob until
+    compact() rewrites it. The index is only written by close(), after the
+    data it points to.
+    """
+
+    def __init__(self, collection_path, reset=False):
+        self.path = thumbs_path(collection_path)
+        self.index_path = thumbs_index_path(collection_path)
+        self._entries = {}
+        self._file = None
+        self._lock = threading.Lock()
+        if reset:
+            for path in (self.path, self.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        else:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)["entries"]
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def open(cls, collection_path):
+        """Return the store of a collection, or None if it has none."""
+        collection_path = resolve_collection_path(collection_path)
+        if not os.path.exists(thumbs_index_path(collection_path)):
+            return None
+        return cls(collection_path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the JPEG bytes stored under key, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        offset, length = entry
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def image(self, key):
+        """Return the thumbnail stored under key as an RGB image, or None."""
+        data = self.get(key)
+        if data is None:
+            return None
+        with Image.open(io.BytesIO(data)) as image:
+            return image.convert("RGB")
+
+    def add(self, key, data):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+                if self._file.tell() == 0:
+                    self._file.write(THUMBS_MAGIC)
+            self._entries[key] = [self._file.tell(), len(data)]
+            self._file.write(data)
+
+    def add_image(self, image_path, locations, thumbnails):
+        """Store the thumbnails encoded by encode_thumbnails for one image and its face locations."""
+        self.add(image_path, thumbnails["image"])
+        for location, data in zip(locations, thumbnails["faces"]):
+            self.add(face_key(image_path, location), data)
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            self._write_index()
+
+    def _write_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": THUMBS_VERSION, "entries": self._entries}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def compact(self, image_paths, min_garbage=0.25):
+        """Keep only the thumbnails of image_paths.
+
+        The blob is only rewritten once at least min_garbage of it is unused,
+        so small incremental updates do not copy the whole store. Returns the
+        number of bytes freed.
+        """
+        self.close()
+        image_paths = set(image_paths)
+        kept = {key: entry for key, entry in self._entries.items()
+                if key in image_paths or key.rpartition("#")[0] in image_paths}
+        used = sum(length for _, length in kept.values())
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+        freed = size - len(THUMBS_MAGIC) - used
+        if freed <= 0 or freed < min_garbage * size:
+            self._entries = kept
+            self._write_index()
+            return 0
+        tmp_path = self.path + ".tmp"
+        entries = {}
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            dst.write(THUMBS_MAGIC)
+            for key, (offset, length) in sorted(kept.items(), key=lambda item: item[1][0]):
+                src.seek(offset)
+                entries[key] = [dst.tell(), length]
+                dst.write(src.read(length))
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, self.path)
+        self._entries = entries
+        self._write_index()
+        return freed
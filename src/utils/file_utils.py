@@ -1,9 +1,100 @@
 import os
+import re
+import fnmatch
+import queue
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-def collect_image_paths(base_folder, extensions):
-    image_paths = []
-    for root, _, files in os.walk(base_folder):
-        for file in files:
-            if any(file.lower().endswith(ext) for ext in extensions):
-                image_paths.append(os.path.join(root, file))
-    return image_paths
+# Define common RAW and standard image extensions
+RAW_EXTENSIONS = ['.nef', '.arw', '.dng', '.cr2', '.cr3']
+IMG_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp']
+
+# A file found by scan_image_files, with the stat result read while scanning
+ScannedFile = namedtuple("ScannedFile", ["path", "stat"])
+
+def is_raw_path(path):
+    return os.path.splitext(path)[1].lower() in RAW_EXTENSIONS
+
+def _compile_excludes(exclude):
+    """One regex for all exclude globs, or None."""
+    if not exclude:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in exclude))
+
+def _scan_directory(directory, rel_dir, extensions, exclude):
+    """List one directory: returns (files, subdirectories), skipping excluded and unreadable entries."""
+    files, subdirs = [], []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if exclude is not None and (exclude.match(entry.name) or exclude.match(rel_path)):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append((entry.path, rel_path))
+                    elif os.path.splitext(entry.name)[1].lower() in extensions:
+                        files.append(ScannedFile(entry.path, entry.stat()))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, subdirs
+
+def scan_image_files(base_folder, extensions, exclude=(), max_depth=None, workers=8):
+    """Yield a ScannedFile for every file under base_folder with one of the given extensions.
+
+    Directories are listed with os.scandir by a pool of threads, and files
+    are yielded as soon as their directory has been read, so callers can show
+    results while a large tree is still being scanned. Order is not
+    deterministic. exclude holds glob patterns matched against both the name
+    and the path relative to base_folder (with / separators) of every file
+    and directory. max_depth limits how deep subdirectories are entered, 0
+    meaning base_folder only. Symlinked directories are not followed. With
+    workers <= 1 the tree is scanned in the calling thread.
+    """
+    extensions = {ext.lower() for ext in extensions}
+    exclude = _compile_excludes(exclude)
+    if workers <= 1:
+        stack = [(base_folder, "", 0)]
+        while stack:
+            path, rel_path, depth = stack.pop()
+            files, subdirs = _scan_directory(path, rel_path, extensions, exclude)
+            if max_depth is None or depth < max_depth:
+                stack.extend((sub_path, sub_rel, depth + 1) for sub_path, sub_rel in subdirs)
+            yield from files
+        return
+
+    # Finished listings are handed back through a queue in completion order
+    done = queue.Queue()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    submitted = set()
+
+    def submit(path, rel_path, depth):
+        future = executor.submit(_scan_directory, path, rel_path, extensions, exclude)
+        submitted.add(future)
+        future.add_done_callback(lambda f: done.put((f, depth)))
+
+    try:
+        submit(base_folder, "", 0)
+        pending = 1
+        while pending:
+            future, depth = done.get()
+            submitted.discard(future)
+            pending -= 1
+            files, subdirs = future.result()
+            if max_depth is None or depth < max_depth:
+                for path, rel_path in subdirs:
+                    submit(path, rel_path, depth + 1)
+                    pending += 1
+            yield from files
+    finally:
+        # A consumer that stops early (e.g. a new folder was chosen) does not wait for the rest.
+        # Queued listings are cancelled by hand, shutdown(cancel_futures=True) needs Python 3.9
+        for future in submitted:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+def collect_image_paths(base_folder, extensions, exclude=(), max_depth=None):
+    """Return the sorted paths of every matching file under base_folder (see scan_image_files)."""
+    return sorted(scanned.path for scanned in scan_image_files(base_folder, extensions, exclude, max_depth))